@@ -1,13 +1,29 @@
-from typing import Annotated
+import hmac
+import uuid
+from typing import Annotated, Optional
 
 from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer, SecurityScopes
+from fastapi.security import (
+    HTTPBasic,
+    HTTPBasicCredentials,
+    OAuth2PasswordBearer,
+    SecurityScopes,
+)
 from jwt import ExpiredSignatureError, InvalidTokenError
-from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from auth.rbac import RBAC
+from auth.revocation import is_revoked
+from auth.scopes import (
+    CATALOG,
+    PermissionDictionary,
+    ScopeRequirement,
+    decode_mask,
+    get_requirement,
+)
+from config.settings import settings
 from db.engine import get_session
-from db.tables import User
+from models import CurrentUser
 from utils.seed import get_system_permissions
 
 
@@ -27,8 +43,16 @@ oauth2_scheme = OAuth2PasswordBearerWithScopes()
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     security_scopes: SecurityScopes,
-    db: Session = Depends(get_session),
-) -> User:
+    db: AsyncSession = Depends(get_session),
+) -> CurrentUser:
+    """The caller, from a verified token that hasn't been revoked.
+
+    Revocations (logout, deactivation) are checked in memory. Strict mode
+    also checks the user is still active in the database on every request,
+    so users disabled by any other path lose access at once, and narrows the
+    token's scopes to those the user holds now. Stateless mode trusts the
+    token until exp.
+    """
     rbac = RBAC(db)
     try:
         validated_token = await rbac.validate_access_token(token)
@@ -39,38 +63,157 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         ) from e
 
-    user_id = validated_token.get("sub")
-    if not user_id:
+    if not validated_token.get("org") or not (
+        "scopes" in validated_token or "scope_mask" in validated_token
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.exec(select(User).where(User.id == user_id)).one_or_none()
-    if not user:
+    if is_revoked(validated_token):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
+            detail="Token has been revoked",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    if not user.is_active:
+    user = CurrentUser(
+        id=validated_token["sub"],
+        org_id=validated_token["org"],
+        jti=validated_token.get("jti"),
+        exp=validated_token["exp"],
+    )
+    requirement = get_requirement(security_scopes.scopes)
+    if settings.TOKEN_VERIFICATION_MODE == "stateless":
+        dictionary, granted = await _get_token_scopes(
+            rbac, user, validated_token, requirement
+        )
+    else:
+        await _check_active(rbac, user)
+        dictionary, granted = await _get_held_scopes(
+            rbac, user, validated_token, requirement
+        )
+
+    if requirement.scopes and not requirement.mask(dictionary) & granted:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Inactive user",
+            detail="Not enough permissions",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return user
+
+
+async def _get_token_scopes(
+    rbac: RBAC,
+    user: CurrentUser,
+    validated_token: dict,
+    requirement: ScopeRequirement,
+) -> tuple[PermissionDictionary, int]:
+    # The catalog is a prefix of every org's dictionary, so checks against
+    # catalog scopes need no lookup
+    if requirement.catalog_only:
+        dictionary = CATALOG
+    else:
+        dictionary = await rbac.get_dictionary(user.org_id)
+    return await _get_token_mask(
+        rbac, validated_token, dictionary, requirement, user.org_id
+    )
+
+
+async def _get_token_mask(
+    rbac: RBAC,
+    validated_token: dict,
+    dictionary: PermissionDictionary,
+    requirement: ScopeRequirement,
+    org_id: uuid.UUID,
+) -> tuple[PermissionDictionary, int]:
+    """The token's scopes as a mask over `dictionary`, or a newer dictionary.
+
+    A mask claim is meaningful against the dictionary version it was issued
+    for and any dictionary that extends it, i.e. until a permission is
+    deleted. Catalog bits never move, so catalog-only checks accept any
+    version; otherwise the org's dictionary is reloaded once in case this
+    worker's copy is behind.
+    """
+    if "scopes" in validated_token:
+        return dictionary, dictionary.mask(validated_token["scopes"])
+    version = validated_token.get("scope_version")
+    try:
+        mask = decode_mask(validated_token["scope_mask"])
+    except ValueError:
+        version = None
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if dictionary.covers(version):
+        return dictionary, mask
+    if requirement.catalog_only:
+        return dictionary, mask & CATALOG.all
+    dictionary = await rbac.get_dictionary(org_id, refresh=True)
+    if not dictionary.covers(version):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token scopes are out of date",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return dictionary, mask
 
-    user_scopes = await rbac.get_scopes(user.id)
-    token_scopes = set(validated_token.get("scopes"))
-    granted = user_scopes & token_scopes
 
-    required_scopes = set(security_scopes.scopes)
-    has_access = required_scopes & granted
-    if not has_access:
+async def _check_active(rbac: RBAC, user: CurrentUser) -> None:
+    is_active = await rbac.is_active(user.id)
+    if is_active is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions",
+            detail="Inactive user",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    return user
+
+async def _get_held_scopes(
+    rbac: RBAC,
+    user: CurrentUser,
+    validated_token: dict,
+    requirement: ScopeRequirement,
+) -> tuple[PermissionDictionary, int]:
+    """The token's scopes that the user still holds, from the scope cache."""
+    dictionary, user_mask = await rbac.get_scope_mask(user.id, user.org_id)
+    token_dictionary, token_mask = await _get_token_mask(
+        rbac, validated_token, dictionary, requirement, user.org_id
+    )
+    if token_dictionary is not dictionary:
+        # Reloaded for the token; remap the user's scopes onto it
+        dictionary, user_mask = await rbac.get_scope_mask(user.id, user.org_id)
+    return dictionary, user_mask & token_mask
+
+
+introspection_basic = HTTPBasic(auto_error=False)
+
+
+def get_introspection_client(
+    credentials: Annotated[
+        Optional[HTTPBasicCredentials], Depends(introspection_basic)
+    ],
+) -> str:
+    """The client_id of a caller listed in INTROSPECTION_CLIENTS."""
+    secret = None
+    if credentials:
+        secret = settings.INTROSPECTION_CLIENTS.get(credentials.username)
+    if not secret or not hmac.compare_digest(
+        credentials.password.encode(), secret.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid client credentials",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    return credentials.username
@@ -0,0 +1,51 @@
+import base64
+import binascii
+from typing import Optional
+
+from fastapi import HTTPException, Query, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config.settings import settings
+from models import Page
+
+
+class PageParams:
+    def __init__(
+        self,
+        limit: int = Query(default=settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(default=None),
+    ) -> None:
+        self.limit = limit
+        self.cursor = cursor
+
+
+def encode_cursor(value) -> str:
+    return base64.urlsafe_b64encode(str(value).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return key.type.python_type(raw.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        ) from e
+
+
+async def paginate(db: AsyncSession, stmt, key, page: PageParams) -> Page:
+    """Run `stmt` one page at a time, keyed on the unique column `key`.
+
+    Seeks past the cursor instead of using OFFSET, so every page costs the
+    same however deep the caller goes.
+    """
+    if page.cursor:
+        stmt = stmt.where(key > decode_cursor(page.cursor, key))
+    result = await db.exec(stmt.order_by(key).limit(page.limit + 1))
+    items = result.all()
+    next_cursor = None
+    if len(items) > page.limit:
+        items = items[: page.limit]
+        next_cursor = encode_cursor(getattr(items[-1], key.key))
+    return Page(items=items, next_cursor=next_cursor)
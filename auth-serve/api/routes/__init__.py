@@ -1,4 +1,6 @@
+from .introspection import introspection_router
 from .jwks import jwks_router
+from .metrics import metrics_router
 from .permission import permission_router
 from .project import project_router
 from .role import role_router
@@ -10,4 +12,6 @@ __all__ = [
     "role_router",
     "permission_router",
     "jwks_router",
+    "metrics_router",
+    "introspection_router",
 ]
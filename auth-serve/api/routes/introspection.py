@@ -0,0 +1,53 @@
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, Form, HTTPException, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.dependency import get_introspection_client
+from auth.introspection import Introspection
+from config.settings import settings
+from db.engine import get_session
+from models import (
+    IntrospectionBatchRequest,
+    IntrospectionBatchResponse,
+    IntrospectionResponse,
+)
+
+introspection_router = APIRouter(
+    prefix="/token",
+    tags=["token"],
+    dependencies=[Depends(get_introspection_client)],
+)
+
+
+@introspection_router.post(
+    "/introspect",
+    response_model=IntrospectionResponse,
+    response_model_exclude_none=True,
+)
+async def introspect(
+    token: Annotated[str, Form()],
+    token_type_hint: Annotated[Optional[str], Form()] = None,
+    db: AsyncSession = Depends(get_session),
+):
+    """RFC 7662 introspection of one access token."""
+    return await Introspection(db).introspect(token)
+
+
+@introspection_router.post(
+    "/introspect/batch",
+    response_model=IntrospectionBatchResponse,
+    response_model_exclude_none=True,
+)
+async def introspect_batch(
+    request: IntrospectionBatchRequest,
+    db: AsyncSession = Depends(get_session),
+):
+    """Introspect up to INTROSPECTION_MAX_BATCH tokens in one round trip."""
+    if len(request.tokens) > settings.INTROSPECTION_MAX_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.INTROSPECTION_MAX_BATCH} tokens per batch",
+        )
+    results = await Introspection(db).introspect_many(request.tokens)
+    return IntrospectionBatchResponse(results=results)
@@ -1,11 +1,27 @@
 # auth_serve/routers/jwks.py
-from fastapi import APIRouter
+from typing import Annotated, Optional
 
-from auth.keystore import KeyStore
+from fastapi import APIRouter, Header, Response, status
+
+from auth.keystore import jwks_cache
+from config.settings import settings
 
 jwks_router = APIRouter(tags=["jwks"])
 
 
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
 @jwks_router.get("/.well-known/jwks.json")
-async def get_jwks():
-    return KeyStore().jwks()
+async def get_jwks(if_none_match: Annotated[Optional[str], Header()] = None):
+    body, etag = jwks_cache.get()
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE}",
+    }
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
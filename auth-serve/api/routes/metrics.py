@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+
+from api.dependency import get_introspection_client
+from db.engine import key_pool_stats, pool_stats
+from utils.hashing import hashing_executor
+
+# For operators' tooling, which authenticates as an introspection client
+metrics_router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(get_introspection_client)],
+)
+
+
+@metrics_router.get("/")
+async def get_metrics():
+    return {
+        "hashing": hashing_executor.stats(),
+        "db_pool": pool_stats(),
+        "key_db_pool": key_pool_stats(),
+    }
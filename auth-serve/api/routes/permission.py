@@ -1,12 +1,25 @@
-from typing import List, Optional
+import re
+from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Security, status
-from sqlmodel import Session, select
+from sqlalchemy import false
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.dependency import get_current_user
+from api.pagination import PageParams, paginate
+from auth.rbac import RBAC, invalidate_scopes, org_scope
+from auth.revocation import Revocations
+from auth.scopes import invalidate_dictionary
 from db.engine import get_session
-from db.tables import Permission, User
-from models import PermissionCreateRequest
+from db.tables import Permission
+from models import (
+    CurrentUser,
+    Page,
+    PermissionCreateRequest,
+    PermissionDictionaryResponse,
+)
+from models.rbac import PermissionActions
 
 permission_router = APIRouter(prefix="/permission", tags=["permission"])
 
@@ -15,40 +28,124 @@ WRITE = "auth.permission.write"
 DELETE = "auth.permission.delete"
 ALL = "auth.permission.all"
 
+ACTIONS = {a.value for a in PermissionActions}
+LIKE_SPECIAL = re.compile(r"[\\%_]")
 
-@permission_router.get("/", response_model=List[Permission])
+
+def slug_filter(pattern: str) -> list:
+    """Conditions for a slug pattern with `*` wildcards.
+
+    A trailing `*` is a prefix match over any number of segments, so
+    `auth.*` and `auth*` match `auth.user.read`. Any other `*` matches
+    within one dot-separated segment: `*.billing.read` matches
+    `crm.billing.read` but not `crm.v2.billing.read`. Interior wildcards are
+    checked as a regex on the slug. Alongside it, any literal prefix is a
+    LIKE, served by the (org_id, slug text_pattern_ops) index, and a
+    three-segment pattern without a trailing `*` has its whole segments
+    checked as equality on the slug's columns. Both only narrow rows the
+    regex would keep: such a pattern matches only slugs of three segments,
+    whose service, resource and action hold no dots.
+    """
+    if "*" not in pattern:
+        return [Permission.slug == pattern]
+    trailing = pattern.endswith("*")
+    body = pattern[:-1] if trailing else pattern
+    conditions = []
+    if "*" in body:
+        regex = r"\.".join(
+            "[^.]*".join(re.escape(part) for part in segment.split("*"))
+            for segment in body.split(".")
+        )
+        conditions.append(
+            Permission.slug.regexp_match(f"^{regex}" if trailing else f"^{regex}$")
+        )
+    prefix = body.split("*", 1)[0]
+    if prefix:
+        like = LIKE_SPECIAL.sub(r"\\\g<0>", prefix) + "%"
+        conditions.append(Permission.slug.like(like, escape="\\"))
+    segments = pattern.split(".")
+    if not trailing and len(segments) == 3:
+        service, resource, action = segments
+        if "*" not in service:
+            conditions.append(Permission.service == service)
+        if "*" not in resource:
+            conditions.append(Permission.resource == resource)
+        if "*" not in action:
+            # Not a permissionactions label, so the regex can't match either
+            if action not in ACTIONS:
+                return [false()]
+            conditions.append(Permission.action == action)
+    return conditions
+
+
+@permission_router.get("/", response_model=Page[Permission])
 async def get_permissions(
     service: Optional[str] = Query(default=None),
     resource: Optional[str] = Query(default=None),
     slug: Optional[str] = Query(default=None),
-    current_user: User = Security(get_current_user, scopes=[READ, ALL]),
-    db: Session = Depends(get_session),
+    page: PageParams = Depends(),
+    current_user: CurrentUser = Security(get_current_user, scopes=[READ, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
     org_id = current_user.org_id
-    stmt = select(Permission).where(Permission.org_id == org_id)
+    stmt = select(Permission).where(org_scope(Permission, org_id, "slug"))
     if service:
         stmt = stmt.where(Permission.service == service)
     if resource:
         stmt = stmt.where(Permission.resource == resource)
     if slug:
-        if slug.endswith("*"):
-            stmt = stmt.where(Permission.slug.startswith(slug[:-1]))
-        else:
-            stmt = stmt.where(Permission.slug == slug)
+        stmt = stmt.where(*slug_filter(slug))
+
+    return await paginate(db, stmt, Permission.id, page)
 
-    permissions = db.exec(stmt).all()
-    return permissions
+
+@permission_router.get("/dictionary", response_model=PermissionDictionaryResponse)
+async def get_permission_dictionary(
+    version: Optional[str] = Query(default=None),
+    current_user: CurrentUser = Security(get_current_user, scopes=[]),
+    db: AsyncSession = Depends(get_session),
+):
+    """The slug order that `scope_mask` claims of this org's tokens index into.
+
+    Open to any token of the org, since verifiers resolve the caller's own
+    token with it. With `version`, answers 404 unless the current dictionary
+    covers it; masks of that version index into the current one unchanged.
+    """
+    rbac = RBAC(db)
+    dictionary = await rbac.get_dictionary(current_user.org_id)
+    if version and not dictionary.covers(version):
+        dictionary = await rbac.get_dictionary(current_user.org_id, refresh=True)
+        if not dictionary.covers(version):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Dictionary version {version} is no longer valid",
+            )
+    return PermissionDictionaryResponse(
+        org=str(current_user.org_id),
+        version=dictionary.version,
+        scopes=list(dictionary.slugs),
+    )
 
 
 @permission_router.post("/")
 async def create_permission(
     permission: PermissionCreateRequest,
-    current_user: User = Security(get_current_user, scopes=[WRITE, ALL]),
-    db: Session = Depends(get_session),
+    current_user: CurrentUser = Security(get_current_user, scopes=[WRITE, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
     org_id = current_user.org_id
+    slug = f"{permission.service}.{permission.resource}.{permission.action.value}"
+    result = await db.exec(
+        select(Permission.id).where(
+            Permission.slug == slug, Permission.org_id.is_(None)
+        )
+    )
+    if result.first() is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Permission {slug} is a system permission",
+        )
     try:
-        slug = f"{permission.service}.{permission.resource}.{permission.action.value}"
         permission = Permission(
             slug=slug,
             org_id=org_id,
@@ -60,27 +157,38 @@ async def create_permission(
             detail=str(e),
         ) from e
     db.add(permission)
-    db.commit()
+    await db.commit()
+    invalidate_dictionary(org_id)
     return permission
 
 
 @permission_router.delete("/")
 async def delete_permission(
     permission_id: int,
-    current_user: User = Security(get_current_user, scopes=[DELETE, ALL]),
-    db: Session = Depends(get_session),
+    current_user: CurrentUser = Security(get_current_user, scopes=[DELETE, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
     org_id = current_user.org_id
-    permission = db.exec(
+    result = await db.exec(
         select(Permission).where(
-            Permission.id == permission_id, Permission.org_id == org_id
+            Permission.id == permission_id, org_scope(Permission, org_id, "slug")
         )
-    ).one_or_none()
+    )
+    permission = result.one_or_none()
     if not permission:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Permission with id {permission_id} not found",
         )
-    db.delete(permission)
-    db.commit()
+    if permission.org_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot delete system permission",
+        )
+    affected_user_ids = await RBAC(db).get_permission_user_ids(permission.id)
+    await db.delete(permission)
+    await Revocations(db).revoke_stale_scopes(affected_user_ids)
+    await db.commit()
+    invalidate_dictionary(org_id)
+    invalidate_scopes(affected_user_ids)
     return permission
@@ -1,10 +1,14 @@
+import uuid
+
 from fastapi import APIRouter, Depends, HTTPException, Security, status
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.dependency import get_current_user
+from api.pagination import PageParams, paginate
 from db.engine import get_session
 from db.tables import Project
-from models import ProjectBase
+from models import CurrentUser, Page, ProjectBase
 
 project_router = APIRouter(prefix="/project", tags=["project"])
 
@@ -17,48 +21,59 @@ ALL = "auth.project.all"
 @project_router.post("/")
 async def create_project(
     request: ProjectBase,
-    current_user=Security(get_current_user, scopes=[WRITE, ALL]),
-    db: Session = Depends(get_session),
+    current_user: CurrentUser = Security(get_current_user, scopes=[WRITE, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
-    project = Project.model_validate(request)
+    project = Project(org_id=current_user.org_id, **request.model_dump())
     db.add(project)
-    db.commit()
+    await db.commit()
     return project
 
 
-@project_router.get("/")
+@project_router.get("/", response_model=Page[Project])
 async def get_projects(
-    current_user: str = Security(get_current_user, scopes=[READ, ALL]),
-    db: Session = Depends(get_session),
+    page: PageParams = Depends(),
+    current_user: CurrentUser = Security(get_current_user, scopes=[READ, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
-    projects = db.exec(select(Project)).all()
-    return projects
+    stmt = select(Project).where(Project.org_id == current_user.org_id)
+    return await paginate(db, stmt, Project.id, page)
 
 
 @project_router.get("/{project_id}")
 async def get_project(
-    project_id,
-    current_user: str = Security(get_current_user, scopes=[READ, ALL]),
-    db: Session = Depends(get_session),
+    project_id: uuid.UUID,
+    current_user: CurrentUser = Security(get_current_user, scopes=[READ, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
-    project = db.exec(select(Project).where(Project.id == project_id)).one_or_none()
+    result = await db.exec(
+        select(Project).where(
+            Project.id == project_id, Project.org_id == current_user.org_id
+        )
+    )
+    project = result.one_or_none()
     return project
 
 
 @project_router.delete("/{project_id}")
 async def delete_project(
-    project_id,
-    current_user=Security(get_current_user, scopes=[DELETE, ALL]),
-    db: Session = Depends(get_session),
+    project_id: uuid.UUID,
+    current_user: CurrentUser = Security(get_current_user, scopes=[DELETE, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
-    project = db.exec(select(Project).where(Project.id == project_id)).one_or_none()
+    result = await db.exec(
+        select(Project).where(
+            Project.id == project_id, Project.org_id == current_user.org_id
+        )
+    )
+    project = result.one_or_none()
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Project with id {project_id} not found",
         )
-    db.delete(project)
-    db.commit()
+    await db.delete(project)
+    await db.commit()
     return project
 
 
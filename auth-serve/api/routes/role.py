@@ -1,17 +1,21 @@
-from typing import List
-
 from fastapi import APIRouter, Depends, HTTPException, Response, Security, status
 from sqlalchemy.exc import IntegrityError
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.dependency import get_current_user
+from api.pagination import PageParams, paginate
+from auth.rbac import RBAC, invalidate_scopes, org_scope
+from auth.revocation import Revocations
 from db.engine import get_session
 from db.tables import Permission, Role, RolePermission, User, UserRole
+from models import CurrentUser, Page
 from models.rbac import (
     AssignRoleRequest,
     AttachPermimissionToRoleRequest,
     RoleCreateRequest,
     RoleType,
+    SystemRole,
 )
 
 role_router = APIRouter(prefix="/role", tags=["role"])
@@ -21,24 +25,27 @@ WRITE = "auth.role.write"
 DELETE = "auth.role.delete"
 ALL = "auth.role.all"
 
+SYSTEM_ROLE_NAMES = {r.value for r in SystemRole}
+
 
-@role_router.get("/", response_model=List[Role])
+@role_router.get("/", response_model=Page[Role])
 async def get_roles(
-    current_user: User = Security(get_current_user, scopes=[READ, ALL]),
-    db: Session = Depends(get_session),
+    page: PageParams = Depends(),
+    current_user: CurrentUser = Security(get_current_user, scopes=[READ, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
     org_id = current_user.org_id
-    roles = db.exec(select(Role).where(Role.org_id == org_id)).all()
-    return roles
+    stmt = select(Role).where(org_scope(Role, org_id, "name"))
+    return await paginate(db, stmt, Role.id, page)
 
 
 @role_router.post("/", response_model=Role)
 async def create_role(
     role: RoleCreateRequest,
-    current_user: User = Security(get_current_user, scopes=[WRITE, ALL]),
-    db: Session = Depends(get_session),
+    current_user: CurrentUser = Security(get_current_user, scopes=[WRITE, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
-    if role.type == RoleType.system:
+    if role.type == RoleType.system or role.name in SYSTEM_ROLE_NAMES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot create system role",
@@ -46,20 +53,21 @@ async def create_role(
     org_id = current_user.org_id
     role = Role(org_id=org_id, **role.model_dump())
     db.add(role)
-    db.commit()
+    await db.commit()
     return role
 
 
 @role_router.delete("/", response_model=Role)
 async def delete_role(
     role_id: int,
-    current_user: User = Security(get_current_user, scopes=[DELETE, ALL]),
-    db: Session = Depends(get_session),
+    current_user: CurrentUser = Security(get_current_user, scopes=[DELETE, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
     org_id = current_user.org_id
-    role = db.exec(
-        select(Role).where(Role.id == role_id, Role.org_id == org_id)
-    ).one_or_none()
+    result = await db.exec(
+        select(Role).where(Role.id == role_id, org_scope(Role, org_id, "name"))
+    )
+    role = result.one_or_none()
     if not role:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -70,30 +78,37 @@ async def delete_role(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot delete system role",
         )
-    db.delete(role)
-    db.commit()
+    affected_user_ids = await RBAC(db).get_role_user_ids(role.id)
+    await db.delete(role)
+    await Revocations(db).revoke_stale_scopes(affected_user_ids)
+    await db.commit()
+    invalidate_scopes(affected_user_ids)
     return role
 
 
 @role_router.post("/assign")
 async def assign_role(
     request: AssignRoleRequest,
-    current_user: User = Security(get_current_user, scopes=[WRITE, ALL]),
-    db: Session = Depends(get_session),
+    current_user: CurrentUser = Security(get_current_user, scopes=[WRITE, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
     org_id = current_user.org_id
-    user = db.exec(
+    result = await db.exec(
         select(User).where(User.username == request.username, User.org_id == org_id)
-    ).one_or_none()
+    )
+    user = result.one_or_none()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with username {request.username} not found",
         )
 
-    role = db.exec(
-        select(Role).where(Role.name == request.role_name, Role.org_id == org_id)
-    ).one_or_none()
+    result = await db.exec(
+        select(Role).where(
+            Role.name == request.role_name, org_scope(Role, org_id, "name")
+        )
+    )
+    role = result.one_or_none()
     if not role:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -102,12 +117,14 @@ async def assign_role(
     try:
         user_role = UserRole(user_id=user.id, role_id=role.id)
         db.add(user_role)
-        db.commit()
+        await Revocations(db).refresh_scopes([user.id])
+        await db.commit()
     except IntegrityError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"User {request.username} already has role {request.role_name}",
         ) from e
+    invalidate_scopes([user.id])
     return Response(status_code=status.HTTP_201_CREATED)
 
 
@@ -119,47 +136,67 @@ async def revoke_role():
     )
 
 
-@role_router.get("/{username}", response_model=List[Role])
+@role_router.get("/{username}", response_model=Page[Role])
 async def get_user_roles(
     username: str,
-    current_user: User = Security(get_current_user, scopes=[READ, ALL]),
-    db: Session = Depends(get_session),
+    page: PageParams = Depends(),
+    current_user: CurrentUser = Security(get_current_user, scopes=[READ, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
     org_id = current_user.org_id
-    user_id = db.exec(
+    result = await db.exec(
         select(User.id).where(User.username == username, User.org_id == org_id)
-    ).one_or_none()
+    )
+    user_id = result.one_or_none()
     if not user_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with username {username} not found",
         )
-    user_roles = db.exec(select(UserRole).where(UserRole.user_id == user_id)).all()
-    user_roles = [user_role.role for user_role in user_roles]
-    return user_roles
+    stmt = (
+        select(Role)
+        .join(UserRole, UserRole.role_id == Role.id)
+        .where(UserRole.user_id == user_id)
+    )
+    return await paginate(db, stmt, Role.id, page)
 
 
 @role_router.post("/attach-permission")
 async def attach_permission(
     request: AttachPermimissionToRoleRequest,
-    current_user: User = Security(get_current_user, scopes=[WRITE, ALL]),
-    db: Session = Depends(get_session),
+    current_user: CurrentUser = Security(get_current_user, scopes=[WRITE, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
     org_id = current_user.org_id
-    permission = db.exec(
+    result = await db.exec(
+        select(Role).where(Role.id == request.role_id, org_scope(Role, org_id, "name"))
+    )
+    role = result.one_or_none()
+    if not role:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Role with id {request.role_id} not found",
+        )
+    result = await db.exec(
         select(Permission).where(
-            Permission.slug == request.permission_slug, Permission.org_id == org_id
+            Permission.slug == request.permission_slug,
+            org_scope(Permission, org_id, "slug"),
         )
-    ).one_or_none()
+    )
+    permission = result.one_or_none()
     if not permission:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Permission with slug {request.permission_slug} not found",
         )
 
-    role_permission = RolePermission(
-        role_id=request.role_id, permission_id=permission.id
-    )
+    rbac = RBAC(db)
+    if role.org_id is None:
+        role = await rbac.fork_system_role(role, org_id)
+    role_permission = RolePermission(role_id=role.id, permission_id=permission.id)
     db.add(role_permission)
-    db.commit()
+    affected_user_ids = await rbac.get_role_user_ids(role.id)
+    await Revocations(db).refresh_scopes(affected_user_ids)
+    await db.commit()
+    invalidate_scopes(affected_user_ids)
     return Response(status_code=status.HTTP_201_CREATED)
@@ -1,15 +1,35 @@
-from typing import Annotated
-
-from fastapi import APIRouter, Depends, HTTPException, Security, status
+from typing import Annotated, Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Form,
+    HTTPException,
+    Response,
+    Security,
+    status,
+)
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.dependency import get_current_user
 from auth.authentication import Authentication
+from auth.rbac import RBAC, invalidate_scopes, org_scope
+from auth.refresh import RefreshTokens
+from auth.revocation import Revocations
 from db.engine import get_session
-from db.tables import Role, User, UserRole
-from models import NewUserInvite, SignupRequest, SignupResponse, Token, UserBase
+from db.tables import Permission, Role, RolePermission, User, UserRole
+from models import (
+    CurrentUser,
+    NewUserInvite,
+    SignupRequest,
+    SignupResponse,
+    Token,
+    UserBase,
+)
 from utils import Hasher
+from utils.hashing import hashing_executor
 
 user_router = APIRouter(prefix="/user", tags=["user"])
 
@@ -20,7 +40,7 @@ ALL = "auth.user.all"
 
 
 @user_router.post("/signup", response_model=SignupResponse)
-async def signup(request: SignupRequest, db: Session = Depends(get_session)):
+async def signup(request: SignupRequest, db: AsyncSession = Depends(get_session)):
     auth = Authentication(db)
     user = await auth.signup(request.org, request.user)
     return SignupResponse(user_id=user.id, org_id=user.org_id)
@@ -29,7 +49,7 @@ async def signup(request: SignupRequest, db: Session = Depends(get_session)):
 @user_router.post("/login")
 async def login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
 ):
     username, password = form_data.username, form_data.password
     requested_scopes = form_data.scopes
@@ -42,27 +62,123 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     access_token = await auth.rbac.create_access_token(
-        user_id=user.id, requested_scopes=requested_scopes
+        user_id=user.id, org_id=user.org_id, requested_scopes=requested_scopes
+    )
+    if not access_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Requested scopes not granted",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    refresh_tokens = RefreshTokens(db)
+    await refresh_tokens.prune(user.id)
+    refresh_token = await refresh_tokens.issue(user.id, requested_scopes)
+    await db.commit()
+    return Token(
+        access_token=access_token, token_type="bearer", refresh_token=refresh_token
+    )
+
+
+@user_router.post("/token/refresh")
+async def refresh(
+    refresh_token: Annotated[str, Form()],
+    db: AsyncSession = Depends(get_session),
+):
+    """Trade a refresh token for a new access token and refresh token.
+
+    Scopes are those asked for at login, minus any the user has since lost.
+    The refresh token given is used up; presenting it again revokes every
+    token descended from the same login.
+    """
+    redeemed = await RefreshTokens(db).redeem(refresh_token)
+    if not redeemed:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token = await RBAC(db).create_access_token(
+        user_id=redeemed.user_id,
+        org_id=redeemed.org_id,
+        requested_scopes=redeemed.scopes,
     )
     if not access_token:
+        # Rolled back, so the refresh token given is not spent
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Requested scopes not granted",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return Token(access_token=access_token, token_type="bearer")
+    await db.commit()
+    return Token(
+        access_token=access_token,
+        token_type="bearer",
+        refresh_token=redeemed.refresh_token,
+    )
+
+
+@user_router.post("/logout")
+async def logout(
+    refresh_token: Annotated[Optional[str], Form()] = None,
+    current_user: CurrentUser = Security(get_current_user, scopes=[]),
+    db: AsyncSession = Depends(get_session),
+):
+    """Revoke the access token used, and the login's refresh tokens if given."""
+    if current_user.jti:
+        await Revocations(db).revoke_token(
+            current_user.jti, current_user.id, current_user.exp
+        )
+    if refresh_token:
+        await RefreshTokens(db).revoke(refresh_token, current_user.id)
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@user_router.post("/{username}/deactivate")
+async def deactivate(
+    username: str,
+    current_user: CurrentUser = Security(get_current_user, scopes=[WRITE, ALL]),
+    db: AsyncSession = Depends(get_session),
+):
+    """Block the user's logins and revoke every token they hold."""
+    result = await db.exec(
+        select(User).where(
+            User.username == username, User.org_id == current_user.org_id
+        )
+    )
+    user = result.one_or_none()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with username {username} not found",
+        )
+    if user.id == current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot deactivate yourself",
+        )
+    user.is_active = False
+    await RefreshTokens(db).revoke_user(user.id)
+    await Revocations(db).revoke_users([user.id])
+    await db.commit()
+    invalidate_scopes([user.id])
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @user_router.post("/invite", response_model=User)
 async def invite(
     request: NewUserInvite,
-    current_user: User = Security(get_current_user, scopes=[WRITE, ALL]),
-    db: Session = Depends(get_session),
+    current_user: CurrentUser = Security(get_current_user, scopes=[WRITE, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
     org_id = current_user.org_id
+    password_hash = await hashing_executor.run(
+        Hasher().get_password_hash, request.password
+    )
     user_data = UserBase(
         username=request.username,
-        password=Hasher().get_password_hash(request.password),
+        password=password_hash,
         primary_email=request.primary_email,
     )
     role_name = request.role
@@ -72,9 +188,10 @@ async def invite(
             detail="Cannot invite owner or create owner role",
         )
     # Query role table
-    role = db.exec(
-        select(Role).where(Role.name == role_name, Role.org_id == org_id)
-    ).one_or_none()
+    result = await db.exec(
+        select(Role).where(Role.name == role_name, org_scope(Role, org_id, "name"))
+    )
+    role = result.one_or_none()
     if not role:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -86,7 +203,7 @@ async def invite(
             **user_data.model_dump(),
         )
         db.add(user)
-        db.commit()
+        await db.commit()
     except Exception as e:
         print(e)
         raise HTTPException(
@@ -96,30 +213,42 @@ async def invite(
 
     user_role = UserRole(user_id=user.id, role_id=role.id)
     db.add(user_role)
-    db.commit()
+    await db.commit()
 
     return user
 
 
 @user_router.get("/me", response_model=User, name="Get current user")
 async def get_me(
-    current_user: User = Security(get_current_user, scopes=[READ, ALL]),
+    current_user: CurrentUser = Security(get_current_user, scopes=[READ, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
-    return current_user
+    user = await db.get(User, current_user.id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
 
 
 @user_router.get("/me/roles", name="Get current user roles")
 async def get_me_roles(
-    current_user: User = Security(get_current_user, scopes=[READ, ALL]),
-    db: Session = Depends(get_session),
+    current_user: CurrentUser = Security(get_current_user, scopes=[READ, ALL]),
+    db: AsyncSession = Depends(get_session),
 ):
-    roles = db.exec(select(UserRole).where(UserRole.user_id == current_user.id)).all()
-    response = []
-    for role in roles:
-        r = {**role.role.model_dump(), "permissions": []}
-        permissions = role.role.role_permissions
-        for permission in permissions:
-            r["permissions"].append(permission.permission.slug)
-        response.append(r)
-
-    return response
+    result = await db.exec(
+        select(Role, Permission.slug)
+        .join(UserRole, UserRole.role_id == Role.id)
+        .outerjoin(RolePermission, RolePermission.role_id == Role.id)
+        .outerjoin(Permission, Permission.id == RolePermission.permission_id)
+        .where(UserRole.user_id == current_user.id)
+    )
+    response = {}
+    for role, slug in result.all():
+        r = response.setdefault(role.id, {**role.model_dump(), "permissions": []})
+        if slug:
+            r["permissions"].append(slug)
+
+    return list(response.values())
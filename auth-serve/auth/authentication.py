@@ -1,14 +1,15 @@
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from db.tables import Organization, OrganizationBase, User, UserBase, UserRole
-from models.rbac import SystemRole
+from db.tables import Organization, OrganizationBase, User, UserBase
 from utils import Hasher
+from utils.hashing import hashing_executor
 
 from .rbac import RBAC
 
 
 class Authentication:
-    def __init__(self, db: Session) -> None:
+    def __init__(self, db: AsyncSession) -> None:
         self.db = db
         self.hasher = Hasher()
         self.rbac = RBAC(db)
@@ -17,31 +18,37 @@ class Authentication:
         # Create org
         org = Organization(**org.model_dump())
         # Create user
+        password_hash = await hashing_executor.run(
+            self.hasher.get_password_hash, user.password
+        )
         user = User(
             org_id=org.id,
             username=user.username,
-            password=self.hasher.get_password_hash(user.password),
+            password=password_hash,
             primary_email=user.primary_email,
         )
         self.db.add(org)
         self.db.add(user)
-        self.db.commit()
-
-        # Seed ACL for this org
-        role_permission_map = await self.rbac.seed_org_acl(org_id=org.id)
+        await self.db.flush()
 
-        # Create default role
-        owner_role_id = role_permission_map["roles"][SystemRole.owner.value]
-        user_role = UserRole(user_id=user.id, role_id=owner_role_id)
-        self.db.add(user_role)
-        self.db.commit()
+        # The org starts out on the global system catalog
+        await self.rbac.add_owner(user.id)
+        await self.db.commit()
 
         return user
 
     async def authenticate_user(self, username: str, password: str):
-        user = self.db.exec(select(User).where(User.username == username)).one_or_none()
+        result = await self.db.exec(select(User).where(User.username == username))
+        user = result.one_or_none()
         if not user:
             return None
-        if not self.hasher.verify_password(password, user.password):
+        verified, new_hash = await hashing_executor.run(
+            self.hasher.verify_and_update, password, user.password
+        )
+        if not verified or not user.is_active:
             return None
+        if new_hash:
+            # Roll out scheme or cost changes without a password reset
+            user.password = new_hash
+            await self.db.commit()
         return user
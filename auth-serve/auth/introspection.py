@@ -0,0 +1,129 @@
+import hashlib
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from jwt import InvalidTokenError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from auth.rbac import RBAC
+from auth.revocation import is_revoked
+from auth.scopes import CATALOG, decode_mask
+from config.settings import settings
+from models import IntrospectionResponse
+from utils.cache import TTLCache
+
+INACTIVE = IntrospectionResponse(active=False)
+
+# sha256(token) -> (IntrospectionResponse, iat claim) of a verified token,
+# until its exp. The response's iat is whole seconds as RFC 7662 has it; the
+# claim's sub-second iat is what revocations are checked against.
+introspection_cache = TTLCache(
+    maxsize=settings.INTROSPECTION_CACHE_SIZE,
+    ttl=settings.JWT_TOKEN_EXPIRATION_TIME,
+)
+
+
+class Introspection:
+    """Answers whether access tokens are active, for RFC 7662 callers.
+
+    Signature checks and scope decoding are cached per token until it
+    expires. Revocations are applied on every read, and in strict mode the
+    user must still be active and the scopes are narrowed to those the user
+    holds now, as get_current_user would. A batch looks those up for all of
+    its users at once.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.rbac = RBAC(db)
+
+    async def introspect(self, token: str) -> IntrospectionResponse:
+        return (await self.introspect_many([token]))[0]
+
+    async def introspect_many(self, tokens: List[str]) -> List[IntrospectionResponse]:
+        results: Dict[str, IntrospectionResponse] = {}
+        for token in tokens:
+            if token not in results:
+                results[token] = await self._verified(token)
+        if settings.TOKEN_VERIFICATION_MODE == "strict":
+            user_ids = {uuid.UUID(r.sub) for r in results.values() if r.active}
+            active = await self.rbac.get_active_user_ids(user_ids)
+            held = await self.rbac.get_scopes_many(active)
+            results = {
+                token: _narrow(result, held) for token, result in results.items()
+            }
+        return [results[token] for token in tokens]
+
+    async def _verified(self, token: str) -> IntrospectionResponse:
+        """The token as issued, or INACTIVE if invalid, expired or revoked."""
+        key = hashlib.sha256(token.encode()).digest()
+        verified = introspection_cache.get(key)
+        if verified is None:
+            verified = await self._verify(token)
+            if verified is None:
+                return INACTIVE
+            introspection_cache.set(key, verified, ttl=verified[0].exp - time.time())
+        result, iat = verified
+        if result.exp <= time.time():
+            return INACTIVE
+        if is_revoked({"sub": result.sub, "iat": iat, "jti": result.jti}):
+            return INACTIVE
+        return result
+
+    async def _verify(
+        self, token: str
+    ) -> Optional[Tuple[IntrospectionResponse, float]]:
+        """The response and iat claim of a valid token, None otherwise."""
+        try:
+            payload = await self.rbac.validate_access_token(token)
+        except InvalidTokenError:
+            return None
+        if not ("org" in payload and "iat" in payload):
+            return None
+        if "scopes" in payload:
+            scopes = payload["scopes"]
+        elif "scope_mask" in payload:
+            scopes = await self._mask_scopes(payload)
+        else:
+            return None
+        response = IntrospectionResponse(
+            active=True,
+            scope=" ".join(sorted(scopes)),
+            sub=payload["sub"],
+            org=payload["org"],
+            exp=payload["exp"],
+            iat=int(payload["iat"]),
+            token_type="Bearer",
+            jti=payload.get("jti"),
+        )
+        return response, payload["iat"]
+
+    async def _mask_scopes(self, payload: Dict) -> List[str]:
+        try:
+            mask = decode_mask(payload["scope_mask"])
+        except ValueError:
+            return []
+        org_id = uuid.UUID(payload["org"])
+        version = payload.get("scope_version") or ""
+        dictionary = await self.rbac.get_dictionary(org_id)
+        if not dictionary.covers(version):
+            dictionary = await self.rbac.get_dictionary(org_id, refresh=True)
+        if not dictionary.covers(version):
+            # Only the catalog bits still mean what they did at issue
+            return CATALOG.slugs_of(mask & CATALOG.all)
+        return dictionary.slugs_of(mask)
+
+
+def _narrow(
+    result: IntrospectionResponse, held: Dict[uuid.UUID, frozenset[str]]
+) -> IntrospectionResponse:
+    """Strict mode: only scopes the user still holds; `held` has active users."""
+    if not result.active:
+        return result
+    user_scopes = held.get(uuid.UUID(result.sub))
+    if user_scopes is None:
+        return INACTIVE
+    scopes = [s for s in result.scope.split() if s in user_scopes]
+    if not scopes:
+        return INACTIVE
+    return result.model_copy(update={"scope": " ".join(scopes)})
@@ -0,0 +1,355 @@
+"""Where signing keys are stored, picked by KEY_BACKEND.
+
+"file" keeps them under ./.keys, for a single node or a shared volume.
+"postgres" keeps them in the signingkey table, so every node signs with the
+same current key and serves the same JWKS. Either way nodes keep parsed keys
+in memory (see auth.keystore) and only poll `version()` to spot changes.
+
+To move keys over, e.g. before switching KEY_BACKEND, run from the auth-serve
+directory:
+
+    uv run python -m auth.key_backends file postgres
+"""
+
+import abc
+import argparse
+import contextlib
+import datetime
+import fcntl
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+from cryptography.hazmat.primitives import serialization
+from sqlalchemy import text, update
+from sqlmodel import Session, delete, select
+
+from config.settings import settings
+from db.engine import key_engine
+from db.tables import SigningKey, SigningKeyState
+from models.auth import KeyMetadata
+
+KEYS_DIR = Path("./.keys")
+PRIVATE_DIR = KEYS_DIR / "private"
+PUBLIC_DIR = KEYS_DIR / "public"
+CURRENT_KID = KEYS_DIR / "current_kid.txt"
+# kid -> KeyMetadata
+METADATA = KEYS_DIR / "metadata.json"
+ROTATION_LOCK = KEYS_DIR / "rotation.lock"
+
+# Held by key rotation, see PostgresKeyBackend.lock
+ADVISORY_LOCK_ID = 0x6B657973  # "keys"
+
+
+class KeyBackend(abc.ABC):
+    """Storage for signing keypairs, their metadata and the current kid."""
+
+    @abc.abstractmethod
+    def setup(self) -> None:
+        """Prepare the storage; called whenever a KeyStore is made."""
+
+    @abc.abstractmethod
+    def version(self) -> Hashable:
+        """Changes whenever a key is added, activated or deleted.
+
+        Polled by the in-memory key caches, so it must be cheap.
+        """
+
+    @abc.abstractmethod
+    def current_kid(self) -> Optional[str]:
+        """The kid that signs, None before the first key."""
+
+    @abc.abstractmethod
+    def private_pem(self, kid: str) -> bytes:
+        """The private key stored under `kid`."""
+
+    @abc.abstractmethod
+    def public_keys(self) -> List[Tuple[str, bytes]]:
+        """[(kid, public_pem_bytes), ...] sorted by kid."""
+
+    @abc.abstractmethod
+    def metadata(self) -> Dict[str, KeyMetadata]:
+        """{kid: KeyMetadata} for every stored key."""
+
+    @abc.abstractmethod
+    def add_key(
+        self, kid: str, private_pem: bytes, public_pem: bytes, metadata: KeyMetadata
+    ) -> None:
+        """Store a keypair without making it current."""
+
+    @abc.abstractmethod
+    def activate(self, kid: str, now: float) -> None:
+        """Make `kid` current, retiring the key it replaces."""
+
+    @abc.abstractmethod
+    def delete_key(self, kid: str) -> None:
+        """Remove a keypair and its metadata."""
+
+    @abc.abstractmethod
+    def lock(self) -> contextlib.AbstractContextManager:
+        """Held across a rotation step, by one process at a time."""
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    # Written aside and renamed over, so readers never see a partial file
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+class FileKeyBackend(KeyBackend):
+    """PEM files under ./.keys, as laid out by `make keys-init`."""
+
+    def setup(self) -> None:
+        KEYS_DIR.mkdir(exist_ok=True)
+        PRIVATE_DIR.mkdir(parents=True, exist_ok=True)
+        PUBLIC_DIR.mkdir(parents=True, exist_ok=True)
+
+    def version(self) -> Hashable:
+        # Adding or deleting a key touches the directory, activating the file
+        try:
+            current = CURRENT_KID.stat().st_mtime_ns
+        except FileNotFoundError:
+            current = None
+        return PUBLIC_DIR.stat().st_mtime_ns, current
+
+    def current_kid(self) -> Optional[str]:
+        try:
+            return CURRENT_KID.read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def private_pem(self, kid: str) -> bytes:
+        return (PRIVATE_DIR / f"{kid}.pem").read_bytes()
+
+    def public_keys(self) -> List[Tuple[str, bytes]]:
+        return [(p.stem, p.read_bytes()) for p in sorted(PUBLIC_DIR.glob("*.pem"))]
+
+    def metadata(self) -> Dict[str, KeyMetadata]:
+        """Keys made before metadata was kept are adopted on first read.
+
+        The current key counts as active since current_kid.txt last changed,
+        any other as retired now, which keeps it until every token it could
+        have signed has expired.
+        """
+        # Imported here, keystore builds on this module
+        from auth.keystore import key_algorithm
+
+        try:
+            stored = json.loads(METADATA.read_text())
+        except FileNotFoundError:
+            stored = {}
+        current = self.current_kid()
+        metadata = {}
+        adopted = False
+        for pem_path in sorted(PUBLIC_DIR.glob("*.pem")):
+            kid = pem_path.stem
+            if kid in stored:
+                metadata[kid] = KeyMetadata(**stored[kid])
+                continue
+            key = serialization.load_pem_public_key(pem_path.read_bytes())
+            entry = KeyMetadata(
+                algorithm=key_algorithm(key), created_at=pem_path.stat().st_mtime
+            )
+            if kid == current:
+                entry.activated_at = CURRENT_KID.stat().st_mtime
+            else:
+                entry.retired_at = time.time()
+            metadata[kid] = entry
+            adopted = True
+        if adopted:
+            self._write_metadata(metadata)
+        return metadata
+
+    def _write_metadata(self, metadata: Dict[str, KeyMetadata]) -> None:
+        _write_atomic(
+            METADATA,
+            json.dumps({kid: m.model_dump() for kid, m in metadata.items()}, indent=2),
+        )
+
+    def add_key(
+        self, kid: str, private_pem: bytes, public_pem: bytes, metadata: KeyMetadata
+    ) -> None:
+        stored = self.metadata()
+        stored[kid] = metadata
+        (PRIVATE_DIR / f"{kid}.pem").write_bytes(private_pem)
+        (PUBLIC_DIR / f"{kid}.pem").write_bytes(public_pem)
+        self._write_metadata(stored)
+
+    def activate(self, kid: str, now: float) -> None:
+        metadata = self.metadata()
+        if kid not in metadata:
+            raise ValueError(f"Unknown kid {kid}")
+        previous = self.current_kid()
+        if previous in metadata and previous != kid:
+            metadata[previous].retired_at = now
+        metadata[kid].activated_at = now
+        self._write_metadata(metadata)
+        _write_atomic(CURRENT_KID, kid)
+
+    def delete_key(self, kid: str) -> None:
+        (PRIVATE_DIR / f"{kid}.pem").unlink(missing_ok=True)
+        (PUBLIC_DIR / f"{kid}.pem").unlink(missing_ok=True)
+        metadata = self.metadata()
+        metadata.pop(kid, None)
+        self._write_metadata(metadata)
+
+    @contextlib.contextmanager
+    def lock(self) -> Iterator[None]:
+        with open(ROTATION_LOCK, "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+
+def _timestamp(value: Optional[datetime.datetime]) -> Optional[float]:
+    return value.timestamp() if value else None
+
+
+def _datetime(value: Optional[float]) -> Optional[datetime.datetime]:
+    if value is None:
+        return None
+    return datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc)
+
+
+class PostgresKeyBackend(KeyBackend):
+    """The signingkey table, shared by every node (migration 0006).
+
+    The single signingkeystate row holds the current kid and a version that
+    every change bumps in the same transaction, so polling for rotations is
+    one primary key lookup. Private keys are stored as they are; keep the
+    database locked down accordingly.
+    """
+
+    def setup(self) -> None:
+        """Nothing to do; the tables come from migration 0006."""
+
+    def version(self) -> Hashable:
+        with Session(key_engine) as db:
+            return db.exec(select(SigningKeyState.version)).one()
+
+    def current_kid(self) -> Optional[str]:
+        with Session(key_engine) as db:
+            return db.exec(select(SigningKeyState.current_kid)).one()
+
+    def private_pem(self, kid: str) -> bytes:
+        with Session(key_engine) as db:
+            return db.exec(
+                select(SigningKey.private_pem).where(SigningKey.kid == kid)
+            ).one()
+
+    def public_keys(self) -> List[Tuple[str, bytes]]:
+        with Session(key_engine) as db:
+            rows = db.exec(
+                select(SigningKey.kid, SigningKey.public_pem).order_by(SigningKey.kid)
+            ).all()
+        return [(kid, bytes(pem)) for kid, pem in rows]
+
+    def metadata(self) -> Dict[str, KeyMetadata]:
+        with Session(key_engine) as db:
+            keys = db.exec(select(SigningKey)).all()
+        return {
+            key.kid: KeyMetadata(
+                algorithm=key.algorithm,
+                created_at=key.created_at.timestamp(),
+                activated_at=_timestamp(key.activated_at),
+                retired_at=_timestamp(key.retired_at),
+            )
+            for key in keys
+        }
+
+    def add_key(
+        self, kid: str, private_pem: bytes, public_pem: bytes, metadata: KeyMetadata
+    ) -> None:
+        with Session(key_engine) as db:
+            db.add(
+                SigningKey(
+                    kid=kid,
+                    algorithm=metadata.algorithm,
+                    private_pem=private_pem,
+                    public_pem=public_pem,
+                    created_at=_datetime(metadata.created_at),
+                    activated_at=_datetime(metadata.activated_at),
+                    retired_at=_datetime(metadata.retired_at),
+                )
+            )
+            self._bump(db)
+            db.commit()
+
+    def activate(self, kid: str, now: float) -> None:
+        with Session(key_engine) as db:
+            # Row lock, so concurrent activations retire the right key
+            previous = db.exec(
+                select(SigningKeyState.current_kid).with_for_update()
+            ).one()
+            key = db.get(SigningKey, kid)
+            if key is None:
+                raise ValueError(f"Unknown kid {kid}")
+            if previous is not None and previous != kid:
+                db.exec(
+                    update(SigningKey)
+                    .where(SigningKey.kid == previous)
+                    .values(retired_at=_datetime(now))
+                )
+            key.activated_at = _datetime(now)
+            db.exec(update(SigningKeyState).values(current_kid=kid))
+            self._bump(db)
+            db.commit()
+
+    def delete_key(self, kid: str) -> None:
+        with Session(key_engine) as db:
+            db.exec(delete(SigningKey).where(SigningKey.kid == kid))
+            self._bump(db)
+            db.commit()
+
+    @contextlib.contextmanager
+    def lock(self) -> Iterator[None]:
+        with key_engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+            try:
+                yield
+            finally:
+                conn.execute(
+                    text("SELECT pg_advisory_unlock(:id)"), {"id": ADVISORY_LOCK_ID}
+                )
+
+    def _bump(self, db: Session) -> None:
+        db.exec(update(SigningKeyState).values(version=SigningKeyState.version + 1))
+
+
+BACKENDS = {"file": FileKeyBackend, "postgres": PostgresKeyBackend}
+
+key_backend: KeyBackend = BACKENDS[settings.KEY_BACKEND]()
+
+
+def copy_keys(source: KeyBackend, target: KeyBackend) -> int:
+    """Copy every key missing from `target`, then match its current key."""
+    source.setup()
+    target.setup()
+    have = target.metadata()
+    metadata = source.metadata()
+    public_pems = dict(source.public_keys())
+    copied = 0
+    for kid, entry in metadata.items():
+        if kid in have:
+            continue
+        target.add_key(kid, source.private_pem(kid), public_pems[kid], entry)
+        copied += 1
+    current = source.current_kid()
+    if current and current != target.current_kid():
+        target.activate(current, metadata[current].activated_at)
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy signing keys between backends")
+    parser.add_argument("source", choices=BACKENDS)
+    parser.add_argument("target", choices=BACKENDS)
+    args = parser.parse_args()
+    copied = copy_keys(BACKENDS[args.source](), BACKENDS[args.target]())
+    print(f"Copied {copied} keys")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,101 @@
 # auth_serve/keystore.py
 from __future__ import annotations
 
+import abc
+import asyncio
 import base64
+import hashlib
+import json
+import logging
+import threading
+import time
 import uuid
-from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Hashable, List, Optional, Tuple
 
 from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from cryptography.hazmat.primitives.asymmetric.types import (
+    PrivateKeyTypes,
+    PublicKeyTypes,
+)
 
-from models.auth import JWKSToken
+from auth import key_backends
+from auth.key_backends import KeyBackend
+from config.settings import settings
+from models.auth import JWKSToken, KeyMetadata
 
-KEYS_DIR = Path("./.keys")
-PRIVATE_DIR = KEYS_DIR / "private"
-PUBLIC_DIR = KEYS_DIR / "public"
-CURRENT_KID = KEYS_DIR / "current_kid.txt"
+
+def _b64url(b: bytes) -> str:
+    return base64.urlsafe_b64encode(b).rstrip(b"=").decode("ascii")
 
 
-def _b64url_uint(n: int) -> str:
+def _b64url_uint(n: int, length: Optional[int] = None) -> str:
     """Base64url-encode an unsigned integer (no padding)."""
-    b = n.to_bytes((n.bit_length() + 7) // 8, "big")
-    return base64.urlsafe_b64encode(b).rstrip(b"=").decode("ascii")
+    return _b64url(n.to_bytes(length or (n.bit_length() + 7) // 8, "big"))
+
+
+def generate_private_key(algorithm: str) -> PrivateKeyTypes:
+    if algorithm == "RS256":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"Unsupported signing algorithm {algorithm}")
+
+
+def key_algorithm(key: PrivateKeyTypes | PublicKeyTypes) -> str:
+    """The JWS algorithm a key signs or verifies with, decided by the key alone.
+
+    Verification never trusts the token's own alg header; a kid always maps to
+    the algorithm of the key stored under it.
+    """
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return "RS256"
+    if isinstance(
+        key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)
+    ) and isinstance(key.curve, ec.SECP256R1):
+        return "ES256"
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "EdDSA"
+    raise ValueError(f"Unsupported key type {type(key).__name__}")
+
+
+logger = logging.getLogger(__name__)
+
+# Unknown kids poll the backend at most this often, so junk kids can't flood it
+MISS_REFRESH_INTERVAL = 1.0
 
 
 class KeyStore:
-    """Loads the current private key for signing and all public keys for JWKS."""
+    """Makes and rotates keypairs, and loads them for signing and for JWKS.
 
-    def __init__(self) -> None:
-        KEYS_DIR.mkdir(exist_ok=True)
-        PRIVATE_DIR.mkdir(parents=True, exist_ok=True)
-        PUBLIC_DIR.mkdir(parents=True, exist_ok=True)
+    Keys are stored by a KeyBackend, by default `key_backends.key_backend`,
+    the KEY_BACKEND one.
+    """
+
+    def __init__(self, backend: Optional[KeyBackend] = None) -> None:
+        self.backend = backend or key_backends.key_backend
+        self.backend.setup()
 
     # ---------- Creation / Rotation ----------
 
-    def _write_current_kid(self, kid: str) -> None:
-        CURRENT_KID.write_text(kid)
+    def current_kid(self) -> Optional[str]:
+        return self.backend.current_kid()
 
-    def _read_current_kid(self) -> str:
-        return CURRENT_KID.read_text().strip()
+    def create_keypair(
+        self, algorithm: Optional[str] = None, activate: bool = True
+    ) -> str:
+        """Generate a new keypair and make it current. Returns kid.
 
-    def create_keypair(self) -> str:
-        """Generate a new RSA keypair and make it current. Returns kid."""
+        The key type follows `algorithm`, by default JWT_SIGNING_ALGORITHM.
+        With `activate=False` the key is only published in the JWKS, to be
+        made current later with `activate`.
+        """
         kid = uuid.uuid4().hex
+        algorithm = algorithm or settings.JWT_SIGNING_ALGORITHM
 
-        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        private_key = generate_private_key(algorithm)
         private_pem = private_key.private_bytes(
             encoding=serialization.Encoding.PEM,
             format=serialization.PrivateFormat.PKCS8,
@@ -54,46 +106,217 @@ class KeyStore:
             format=serialization.PublicFormat.SubjectPublicKeyInfo,
         )
 
-        (PRIVATE_DIR / f"{kid}.pem").write_bytes(private_pem)
-        (PUBLIC_DIR / f"{kid}.pem").write_bytes(public_pem)
-        self._write_current_kid(kid)
+        metadata = KeyMetadata(algorithm=algorithm, created_at=time.time())
+        self.backend.add_key(kid, private_pem, public_pem, metadata)
+        if activate:
+            self.backend.activate(kid, time.time())
+        public_key_cache.invalidate()
+        signing_key_cache.invalidate()
+        jwks_cache.invalidate()
         return kid
 
-    def rotate(self) -> str:
-        """Alias for create_keypair(). Keep old public keys so old tokens verify."""
-        return self.create_keypair()
+    def activate(self, kid: str) -> None:
+        """Sign with a published key from now on, retiring the current one."""
+        self.backend.activate(kid, time.time())
+        signing_key_cache.invalidate()
+
+    def rotate(self, algorithm: Optional[str] = None) -> str:
+        """Make a new key current right away, e.g. after a compromise.
+
+        The old public key stays until pruned, so tokens it signed verify. Other
+        verifiers only learn the new kid on their next JWKS fetch; scheduled
+        rotation (auth/rotation.py) publishes the key ahead of use instead.
+        """
+        return self.create_keypair(algorithm)
+
+    def delete_keypair(self, kid: str) -> None:
+        """Remove a retired key; tokens it signed no longer verify."""
+        if kid == self.current_kid():
+            raise ValueError("The current signing key can't be deleted")
+        self.backend.delete_key(kid)
+        public_key_cache.invalidate()
+        jwks_cache.invalidate()
+
+    def key_metadata(self) -> Dict[str, KeyMetadata]:
+        return self.backend.metadata()
 
     # ---------- Loading keys ----------
 
+    def version(self) -> Hashable:
+        """Changes with any key change, see KeyBackend.version."""
+        return self.backend.version()
+
     def get_current_signing_key(self) -> Tuple[str, bytes]:
         """Returns (kid, private_pem_bytes)."""
-        kid = self._read_current_kid()
-        pem = (PRIVATE_DIR / f"{kid}.pem").read_bytes()
-        return kid, pem
+        kid = self.current_kid()
+        if kid is None:
+            raise LookupError("No current signing key")
+        return kid, self.backend.private_pem(kid)
+
+    def load_current_signing_key(self) -> Tuple[str, PrivateKeyTypes]:
+        """Returns (kid, parsed private key)."""
+        kid, pem = self.get_current_signing_key()
+        return kid, serialization.load_pem_private_key(pem, password=None)
 
     def list_public_keys(self) -> List[Tuple[str, bytes]]:
-        """[(kid, public_pem_bytes), ...] sorted by filename for stability."""
-        pairs: List[Tuple[str, bytes]] = []
-        for pem_path in sorted(PUBLIC_DIR.glob("*.pem")):
-            pairs.append((pem_path.stem, pem_path.read_bytes()))
-        return pairs
+        """[(kid, public_pem_bytes), ...] sorted by kid for stability."""
+        return self.backend.public_keys()
+
+    def load_public_keys(self) -> Dict[str, PublicKeyTypes]:
+        """{kid: parsed public key} for every stored public key."""
+        return {
+            kid: serialization.load_pem_public_key(pem)
+            for kid, pem in self.list_public_keys()
+        }
 
     # ---------- JWKS ----------
 
     def _public_pem_to_jwk(self, kid: str, public_pem: bytes) -> JWKSToken:
         """Convert a PEM public key to a JWK dict for JWKS."""
         public_key = serialization.load_pem_public_key(public_pem)
-        if not isinstance(public_key, rsa.RSAPublicKey):
-            raise ValueError("Only RSA keys are supported")
+        algorithm = key_algorithm(public_key)
 
-        numbers = public_key.public_numbers()
-        n = _b64url_uint(numbers.n)
-        e = _b64url_uint(numbers.e)
-        return JWKSToken(kid=kid, n=n, e=e)
+        if algorithm == "RS256":
+            numbers = public_key.public_numbers()
+            n = _b64url_uint(numbers.n)
+            e = _b64url_uint(numbers.e)
+            return JWKSToken(kid=kid, n=n, e=e)
+        if algorithm == "ES256":
+            # Coordinates are fixed-length, left-padded to the curve size
+            numbers = public_key.public_numbers()
+            x = _b64url_uint(numbers.x, 32)
+            y = _b64url_uint(numbers.y, 32)
+            return JWKSToken(kty="EC", alg=algorithm, kid=kid, crv="P-256", x=x, y=y)
+        raw = public_key.public_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PublicFormat.Raw,
+        )
+        x = _b64url(raw)
+        return JWKSToken(kty="OKP", alg=algorithm, kid=kid, crv="Ed25519", x=x)
 
     def jwks(self) -> Dict[str, List[Dict]]:
         keys = [
-            self._public_pem_to_jwk(kid, pem).model_dump()
+            self._public_pem_to_jwk(kid, pem).model_dump(exclude_none=True)
             for kid, pem in self.list_public_keys()
         ]
         return {"keys": keys}
+
+
+class _ReloadingCache(abc.ABC):
+    """Keeps a value loaded from the key backend, reloading when keys change.
+
+    Reads only ever return the value in memory; reading the backend, a
+    database round trip with KEY_BACKEND=postgres, is left to `refresh`,
+    which the server runs off the event loop (see run_key_cache_refresh).
+    The keys themselves are only read again once the backend's version
+    moves. Reloads build a new value and swap it in with one assignment, so
+    concurrent readers never see a partial load.
+    """
+
+    def __init__(self) -> None:
+        self._value = None
+        self._version: Optional[Hashable] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _load(self, ks: KeyStore):
+        """Build the cached value from the stored keys."""
+
+    def _current(self):
+        if self._value is None:
+            # Never loaded: a script, or a server whose startup found no keys
+            self.refresh()
+        return self._value
+
+    def refresh(self, force: bool = False, max_age: float = 0.0) -> None:
+        """Reload if the keys changed; blocks on the key backend.
+
+        Skipped if the version was checked less than `max_age` seconds ago,
+        so callers racing to reload share one backend read.
+        """
+        with self._lock:
+            if not force and time.monotonic() - self._checked_at < max_age:
+                return
+            ks = KeyStore()
+            version = ks.version()
+            self._checked_at = time.monotonic()
+            if not force and version == self._version:
+                return
+            self._value = self._load(ks)
+            self._version = version
+
+    def invalidate(self) -> None:
+        """Reload now, after this process changed the keys."""
+        self.refresh(force=True)
+
+
+class PublicKeyCache(_ReloadingCache):
+    """Process-wide kid -> (parsed public key, algorithm) map to verify tokens."""
+
+    def _load(self, ks: KeyStore) -> Dict[str, Tuple[PublicKeyTypes, str]]:
+        return {
+            kid: (key, key_algorithm(key)) for kid, key in ks.load_public_keys().items()
+        }
+
+    def get(self, kid: str) -> Optional[Tuple[PublicKeyTypes, str]]:
+        return self._current().get(kid)
+
+    async def fetch(self, kid: str) -> Optional[Tuple[PublicKeyTypes, str]]:
+        """`get`, but an unknown kid reloads the keys first, off the event loop.
+
+        Possibly rotated by another node since the last reload.
+        """
+        key = self.get(kid)
+        if key is None:
+            await asyncio.to_thread(self.refresh, max_age=MISS_REFRESH_INTERVAL)
+            key = self.get(kid)
+        return key
+
+
+class SigningKeyCache(_ReloadingCache):
+    """The current (kid, parsed private key, algorithm) used to sign tokens."""
+
+    def _load(self, ks: KeyStore) -> Tuple[str, PrivateKeyTypes, str]:
+        kid, key = ks.load_current_signing_key()
+        return kid, key, key_algorithm(key)
+
+    def get(self) -> Tuple[str, PrivateKeyTypes, str]:
+        return self._current()
+
+
+class JWKSCache(_ReloadingCache):
+    """The JWKS document, serialized once per key set, with its ETag."""
+
+    def _load(self, ks: KeyStore) -> Tuple[bytes, str]:
+        body = json.dumps(ks.jwks(), separators=(",", ":")).encode()
+        return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+    def get(self) -> Tuple[bytes, str]:
+        """Returns (JSON body, strong ETag)."""
+        return self._current()
+
+
+public_key_cache = PublicKeyCache()
+signing_key_cache = SigningKeyCache()
+jwks_cache = JWKSCache()
+
+
+def refresh_key_caches() -> None:
+    """Reload every key cache whose keys changed; blocks on the key backend."""
+    for cache in (public_key_cache, signing_key_cache, jwks_cache):
+        try:
+            cache.refresh()
+        except Exception:
+            logger.exception("Reloading %s failed", type(cache).__name__)
+
+
+async def run_key_cache_refresh() -> None:
+    """Refresh the key caches every KEY_CACHE_REFRESH_INTERVAL seconds.
+
+    In a worker thread, so polling the key backend never holds up requests.
+    Runs until cancelled.
+    """
+    while True:
+        await asyncio.sleep(settings.KEY_CACHE_REFRESH_INTERVAL)
+        await asyncio.to_thread(refresh_key_caches)
@@ -1,48 +1,242 @@
 import datetime
-import json
+import functools
 import uuid
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional
 
 import jwt
-from jwt.algorithms import RSAAlgorithm
-from sqlmodel import Session, select
+from sqlalchemy import (
+    String,
+    and_,
+    bindparam,
+    cast,
+    func,
+    insert,
+    literal,
+    or_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from auth.keystore import KeyStore
+from auth.keystore import public_key_cache, signing_key_cache
+from auth.scopes import (
+    CATALOG,
+    PermissionDictionary,
+    dictionary_cache,
+    encode_mask,
+)
 from config.settings import settings
-from db.tables import Permission, Role, RolePermission, UserRole
-from models.rbac import JWTPayload
+from db.tables import Permission, Role, RolePermission, User, UserRole
+from models.rbac import JWTPayload, RoleType, SystemRole
+from utils.cache import TTLCache
 from utils.seed import (
     ROLE_PERMISSION_MAP,
     get_system_permissions,
     get_system_roles,
 )
 
-JWT_ALGORITHM = "RS256"
+
+class Grants:
+    """A user's scopes, plus their mask under the dictionary it was built for."""
+
+    __slots__ = ("scopes", "mask", "version")
+
+    def __init__(self, scopes: frozenset[str]) -> None:
+        self.scopes = scopes
+        self.mask = 0
+        self.version = None
+
+
+# user_id -> Grants
+scope_cache = TTLCache(maxsize=settings.SCOPE_CACHE_SIZE, ttl=settings.SCOPE_CACHE_TTL)
+
+
+def invalidate_scopes(user_ids: Iterable[uuid.UUID]) -> None:
+    """Drop cached scopes, to be called once an ACL change is committed."""
+    for user_id in user_ids:
+        scope_cache.pop(user_id)
+
+
+def org_scope(model, org_id: uuid.UUID, key: str):
+    """Rows owned by the org plus the global catalog rows it has not overridden.
+
+    `key` is the column an org row shadows a catalog row by, e.g. a role name.
+    """
+    own = aliased(model)
+    overridden = select(getattr(own, key)).where(own.org_id == org_id)
+    return or_(
+        model.org_id == org_id,
+        and_(model.org_id.is_(None), getattr(model, key).not_in(overridden)),
+    )
 
 
 class RBAC:
-    def __init__(self, db: Session) -> None:
+    def __init__(self, db: AsyncSession) -> None:
         self.db = db
 
-    async def get_scopes(self, user_id: uuid.UUID) -> set[str]:
-        roles = self.db.exec(select(UserRole).where(UserRole.user_id == user_id)).all()
-
-        scopes = set()
-        for role in roles:
-            role_permissions = self.db.exec(
-                select(RolePermission).where(RolePermission.role_id == role.role_id)
-            ).all()
-            for role_permission in role_permissions:
-                permission = role_permission.permission
-                scope = permission.slug
-                scopes.add(scope)
+    async def is_active(self, user_id: uuid.UUID) -> Optional[bool]:
+        """Whether the user is active, None if they don't exist; never cached."""
+        result = await self.db.exec(select(User.is_active).where(User.id == user_id))
+        return result.one_or_none()
+
+    async def get_active_user_ids(
+        self, user_ids: Iterable[uuid.UUID]
+    ) -> set[uuid.UUID]:
+        """Those of the users that exist and are active, in one query."""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        result = await self.db.exec(
+            select(User.id).where(User.id.in_(user_ids), User.is_active)
+        )
+        return set(result.all())
+
+    async def get_scopes(self, user_id: uuid.UUID) -> frozenset[str]:
+        return (await self._get_grants(user_id)).scopes
+
+    async def get_scopes_many(
+        self, user_ids: Iterable[uuid.UUID]
+    ) -> Dict[uuid.UUID, frozenset[str]]:
+        """get_scopes of several users, in one query for those not cached."""
+        scopes = {}
+        missing = []
+        for user_id in user_ids:
+            grants = scope_cache.get(user_id)
+            if grants is None:
+                missing.append(user_id)
+            else:
+                scopes[user_id] = grants.scopes
+        if not missing:
+            return scopes
+        result = await self.db.exec(
+            select(UserRole.user_id, Permission.slug)
+            .select_from(Permission)
+            .join(RolePermission, RolePermission.permission_id == Permission.id)
+            .join(UserRole, UserRole.role_id == RolePermission.role_id)
+            .where(UserRole.user_id.in_(missing))
+            .distinct()
+        )
+        held: Dict[uuid.UUID, set] = {user_id: set() for user_id in missing}
+        for user_id, slug in result.all():
+            held[user_id].add(slug)
+        for user_id, slugs in held.items():
+            grants = Grants(frozenset(slugs))
+            scope_cache.set(user_id, grants)
+            scopes[user_id] = grants.scopes
         return scopes
 
+    async def get_scope_mask(
+        self, user_id: uuid.UUID, org_id: uuid.UUID
+    ) -> tuple[PermissionDictionary, int]:
+        """The user's scopes as a mask, and the org dictionary it is under."""
+        grants = await self._get_grants(user_id)
+        dictionary = await self.get_dictionary(org_id)
+        if grants.version != dictionary.version:
+            if not grants.scopes <= dictionary.bits.keys():
+                # A permission created since the dictionary was cached
+                dictionary = await self.get_dictionary(org_id, refresh=True)
+            grants.mask = dictionary.mask(grants.scopes)
+            grants.version = dictionary.version
+        return dictionary, grants.mask
+
+    async def get_dictionary(
+        self, org_id: uuid.UUID, refresh: bool = False
+    ) -> PermissionDictionary:
+        dictionary = None if refresh else dictionary_cache.get(org_id)
+        if dictionary is None:
+            result = await self.db.exec(
+                select(Permission.slug)
+                .where(Permission.org_id == org_id)
+                .order_by(Permission.id)
+            )
+            dictionary = CATALOG.extend(result.all())
+            dictionary_cache.set(org_id, dictionary)
+        return dictionary
+
+    async def _get_grants(self, user_id: uuid.UUID) -> Grants:
+        grants = scope_cache.get(user_id)
+        if grants is not None:
+            return grants
+
+        # Catalog and org roles resolve alike; catalog roles only ever link
+        # catalog permissions, org changes go to a fork (see fork_system_role)
+        stmt = (
+            select(Permission.slug)
+            .join(RolePermission, RolePermission.permission_id == Permission.id)
+            .join(UserRole, UserRole.role_id == RolePermission.role_id)
+            .where(UserRole.user_id == user_id)
+            .distinct()
+        )
+        result = await self.db.exec(stmt)
+        grants = Grants(frozenset(result.all()))
+        scope_cache.set(user_id, grants)
+        return grants
+
+    async def get_role_user_ids(self, role_id: int) -> List[uuid.UUID]:
+        """Users whose scopes change when the role does."""
+        result = await self.db.exec(
+            select(UserRole.user_id).where(UserRole.role_id == role_id)
+        )
+        return result.all()
+
+    async def get_permission_user_ids(self, permission_id: int) -> List[uuid.UUID]:
+        """Users whose scopes change when the permission does."""
+        result = await self.db.exec(
+            select(UserRole.user_id)
+            .join(RolePermission, RolePermission.role_id == UserRole.role_id)
+            .where(RolePermission.permission_id == permission_id)
+            .distinct()
+        )
+        return result.all()
+
+    async def add_owner(self, user_id: uuid.UUID) -> None:
+        """Make the user an owner through the catalog owner role."""
+        await self.db.exec(
+            insert(UserRole).from_select(
+                ["user_id", "role_id"],
+                select(
+                    literal(user_id, UserRole.__table__.c.user_id.type), Role.id
+                ).where(Role.name == SystemRole.owner.value, Role.org_id.is_(None)),
+            )
+        )
+
+    async def fork_system_role(self, role: Role, org_id: uuid.UUID) -> Role:
+        """Copy a catalog role into the org so it can be changed there.
+
+        The copy keeps the catalog's permissions and takes over the org's
+        assignments, and from then on shadows the catalog role for the org.
+        """
+        fork = Role(name=role.name, type=role.type, org_id=org_id)
+        self.db.add(fork)
+        await self.db.flush()
+        await self.db.exec(
+            insert(RolePermission).from_select(
+                ["role_id", "permission_id"],
+                select(literal(fork.id), RolePermission.permission_id).where(
+                    RolePermission.role_id == role.id
+                ),
+            )
+        )
+        await self.db.exec(
+            update(UserRole)
+            .where(
+                UserRole.role_id == role.id,
+                UserRole.user_id.in_(select(User.id).where(User.org_id == org_id)),
+            )
+            .values(role_id=fork.id)
+        )
+        return fork
+
     async def create_access_token(
-        self, user_id: uuid.UUID, requested_scopes: List[str]
+        self, user_id: uuid.UUID, org_id: uuid.UUID, requested_scopes: List[str]
     ):
         expire_after = datetime.timedelta(seconds=settings.JWT_TOKEN_EXPIRATION_TIME)
-        expire = datetime.datetime.now(tz=datetime.timezone.utc) + expire_after
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        expire = now + expire_after
         scopes = await self.get_scopes(user_id)
         if not requested_scopes:
             requested_scopes = list(scopes)
@@ -51,63 +245,166 @@ class RBAC:
         if not scopes:
             return None
         jwt_payload = JWTPayload(
-            sub=str(user_id), exp=expire, iat=datetime.datetime.now(), scopes=scopes
+            sub=str(user_id),
+            org=str(org_id),
+            exp=expire,
+            iat=now.timestamp(),
+            jti=uuid.uuid4().hex,
         )
-        ks = KeyStore()
-        kid, private_pem = ks.get_current_signing_key()
+        if settings.TOKEN_SCOPE_FORMAT == "mask":
+            dictionary, _ = await self.get_scope_mask(user_id, org_id)
+            jwt_payload.scope_mask = encode_mask(dictionary.mask(scopes))
+            jwt_payload.scope_version = dictionary.version
+        else:
+            jwt_payload.scopes = list(scopes)
+        kid, private_key, algorithm = signing_key_cache.get()
         return jwt.encode(
-            jwt_payload.model_dump(),
-            private_pem,
-            algorithm=JWT_ALGORITHM,
+            jwt_payload.model_dump(exclude_none=True),
+            private_key,
+            algorithm=algorithm,
             headers={"kid": kid},
         )
 
     async def validate_access_token(self, token: str) -> Dict:
-        ks = KeyStore()
-        jwks = ks.jwks()
         unverified_header = jwt.get_unverified_header(token)
         kid = unverified_header.get("kid")
-        if not kid:
+        # The header is unverified; anything but a string is no key id
+        if not kid or not isinstance(kid, str):
             raise jwt.InvalidTokenError("Invalid kid in token")
-        matches = [k for k in jwks["keys"] if k.get("kid") == kid]
-        matching = matches[0] if matches else None
-        if not matching:
+        entry = await public_key_cache.fetch(kid)
+        if not entry:
             raise jwt.InvalidTokenError("Invalid kid in token")
 
-        public_key = RSAAlgorithm.from_jwk(json.dumps(matching))
-        if not public_key:
-            raise jwt.InvalidTokenError
-
+        public_key, algorithm = entry
         payload = jwt.decode(
             token,
             public_key,
-            algorithms=[JWT_ALGORITHM],
-            options={"require": ["exp", "sub", "scopes"]},
+            algorithms=[algorithm],
+            options={"require": ["exp", "iat", "sub"]},
         )
         return payload
 
-    async def seed_org_acl(self, org_id: uuid.UUID) -> dict:
-        # Roles
-        role_rows = [Role(**r) for r in get_system_roles(org_id)]
-        self.db.add_all(role_rows)
-        self.db.flush()
-        role_id_by_name = {r.name: r.id for r in role_rows}
-
-        # Permissions
-        perm_rows = [Permission(**p) for p in get_system_permissions(org_id)]
-        self.db.add_all(perm_rows)
-        self.db.flush()
-        perm_id_by_slug = {p.slug: p.id for p in perm_rows}
-
-        # Role-Permission links
-        rp_links = []
-        for role_name, slugs in ROLE_PERMISSION_MAP.items():
-            role_id = role_id_by_name[role_name]
-            for slug in slugs:
-                rp_links.append(
-                    RolePermission(role_id=role_id, permission_id=perm_id_by_slug[slug])
-                )
-        self.db.add_all(rp_links)
-        self.db.flush()
-
-        return {"roles": role_id_by_name, "permissions": perm_id_by_slug}
+    async def seed_system_catalog(self) -> None:
+        """Create the global system roles and permissions if they are missing."""
+        result = await self.db.exec(select(Role.id).where(Role.org_id.is_(None)))
+        if result.first() is not None:
+            return
+        try:
+            await self.seed_org_acl(org_id=None)
+            await self.db.commit()
+        except IntegrityError:
+            # Another worker seeded it first
+            await self.db.rollback()
+
+    async def seed_org_acl(
+        self, org_id: Optional[uuid.UUID], owner_user_id: Optional[uuid.UUID] = None
+    ) -> dict:
+        """Create the default roles, permissions and links for an org.
+
+        Runs as one statement, see `_seed_statement`. When `owner_user_id` is
+        given the user is linked to the owner role in the same statement. With
+        no `org_id` this seeds the global catalog.
+        """
+        result = await self.db.exec(
+            _seed_statement(with_owner=owner_user_id is not None),
+            params={
+                **_seed_params(),
+                "org_id": org_id,
+                "owner_user_id": owner_user_id,
+            },
+        )
+        seeded = {"roles": {}, "permissions": {}}
+        for kind, name, row_id in result.all():
+            seeded[f"{kind}s"][name] = row_id
+        return seeded
+
+
+def _unnest(name: str, *columns: str):
+    """`unnest(:a, :b) AS name(a, b)` over text array parameters."""
+    arrays = [bindparam(c, type_=ARRAY(String)) for c in columns]
+    return func.unnest(*arrays).table_valued(*columns).render_derived(name=name)
+
+
+@functools.cache
+def _seed_params() -> dict:
+    roles = get_system_roles(None)
+    permissions = get_system_permissions(None)
+    links = [(r, slug) for r, slugs in ROLE_PERMISSION_MAP.items() for slug in slugs]
+    return {
+        "name": [r["name"] for r in roles],
+        **{
+            column: [p[column] for p in permissions]
+            for column in ("action", "service", "resource", "slug", "description")
+        },
+        "role": [role for role, _ in links],
+        "permission": [slug for _, slug in links],
+    }
+
+
+@functools.cache
+def _seed_statement(with_owner: bool):
+    """The default org ACL as chained INSERT ... RETURNING CTEs.
+
+    The seed data is passed as arrays rather than rendered as VALUES rows, so
+    the statement text is constant and both the compiled SQL and the server
+    side prepared statement are reused across signups.
+    """
+    org_id = bindparam("org_id", type_=Role.__table__.c.org_id.type)
+
+    role_rows = _unnest("role_rows", "name")
+    roles = (
+        insert(Role)
+        .from_select(
+            ["name", "type", "org_id"],
+            select(
+                role_rows.c.name,
+                literal(RoleType.system, Role.__table__.c.type.type),
+                org_id,
+            ),
+        )
+        .returning(Role.id, Role.name)
+        .cte("roles")
+    )
+
+    permission_rows = _unnest(
+        "permission_rows", "action", "service", "resource", "slug", "description"
+    )
+    permissions = (
+        insert(Permission)
+        .from_select(
+            ["action", "service", "resource", "slug", "description", "org_id"],
+            select(
+                cast(permission_rows.c.action, Permission.__table__.c.action.type),
+                permission_rows.c.service,
+                permission_rows.c.resource,
+                permission_rows.c.slug,
+                permission_rows.c.description,
+                org_id,
+            ),
+        )
+        .returning(Permission.id, Permission.slug)
+        .cte("permissions")
+    )
+
+    link_rows = _unnest("link_rows", "role", "permission")
+    links = insert(RolePermission).from_select(
+        ["role_id", "permission_id"],
+        select(roles.c.id, permissions.c.id)
+        .join_from(link_rows, roles, roles.c.name == link_rows.c.role)
+        .join(permissions, permissions.c.slug == link_rows.c.permission),
+    )
+
+    statement = union_all(
+        select(literal("role"), roles.c.name, roles.c.id),
+        select(literal("permission"), permissions.c.slug, permissions.c.id),
+    ).add_cte(links.cte("links"))
+    if with_owner:
+        owner = insert(UserRole).from_select(
+            ["user_id", "role_id"],
+            select(
+                bindparam("owner_user_id", type_=UserRole.__table__.c.user_id.type),
+                roles.c.id,
+            ).where(roles.c.name == SystemRole.owner.value),
+        )
+        statement = statement.add_cte(owner.cte("owner"))
+    return statement
@@ -0,0 +1,133 @@
+import datetime
+import hashlib
+import hmac
+import secrets
+import uuid
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import delete, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config.settings import settings
+from db.tables import RefreshToken, User
+
+
+class Redeemed(NamedTuple):
+    user_id: uuid.UUID
+    org_id: uuid.UUID
+    scopes: List[str]
+    refresh_token: str
+
+
+def hash_token(token: str) -> str:
+    """Keyed so a copy of the table alone can't be used to check guesses."""
+    return hmac.new(
+        settings.REFRESH_TOKEN_SECRET.encode(), token.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+class RefreshTokens:
+    """Issues and redeems single-use refresh tokens.
+
+    Redeeming takes no password hashing: the token is matched by its hash in
+    one indexed UPDATE that also marks it used, so two concurrent redemptions
+    of the same token can't both succeed.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def issue(
+        self,
+        user_id: uuid.UUID,
+        scopes: List[str],
+        family_id: Optional[uuid.UUID] = None,
+    ) -> str:
+        """Store a new token and return it; the caller commits."""
+        token = secrets.token_urlsafe(32)
+        expires_at = datetime.datetime.now(
+            tz=datetime.timezone.utc
+        ) + datetime.timedelta(seconds=settings.REFRESH_TOKEN_EXPIRATION_TIME)
+        self.db.add(
+            RefreshToken(
+                token_hash=hash_token(token),
+                family_id=family_id or uuid.uuid4(),
+                user_id=user_id,
+                scopes=list(scopes),
+                expires_at=expires_at,
+            )
+        )
+        return token
+
+    async def redeem(self, token: str) -> Optional[Redeemed]:
+        """Use up a token and issue its successor; the caller commits.
+
+        Returns None for unknown, expired or already used tokens, and for
+        inactive users. Reuse of a used token revokes its whole family, which
+        is committed right away. Until the caller commits, the token stays
+        usable, so a refresh that fails later on doesn't spend it.
+        """
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        token_hash = hash_token(token)
+        result = await self.db.exec(
+            update(RefreshToken)
+            .where(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.used_at.is_(None),
+                RefreshToken.expires_at > now,
+                RefreshToken.user_id == User.id,
+                User.is_active,
+            )
+            .values(used_at=now)
+            .returning(
+                RefreshToken.user_id,
+                RefreshToken.family_id,
+                RefreshToken.scopes,
+                User.org_id,
+            )
+        )
+        row = result.one_or_none()
+        if row is None:
+            await self._revoke_if_reused(token_hash)
+            return None
+
+        user_id, family_id, scopes, org_id = row
+        refresh_token = await self.issue(user_id, scopes, family_id)
+        return Redeemed(user_id, org_id, scopes, refresh_token)
+
+    async def _revoke_if_reused(self, token_hash: str) -> None:
+        result = await self.db.exec(
+            select(RefreshToken.family_id).where(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.used_at.is_not(None),
+            )
+        )
+        family_id = result.first()
+        if family_id is not None:
+            await self.db.exec(
+                delete(RefreshToken).where(RefreshToken.family_id == family_id)
+            )
+        await self.db.commit()
+
+    async def revoke(self, token: str, user_id: uuid.UUID) -> None:
+        """Drop the user's token and every token descended from the same login."""
+        family_id = select(RefreshToken.family_id).where(
+            RefreshToken.token_hash == hash_token(token),
+            RefreshToken.user_id == user_id,
+        )
+        await self.db.exec(
+            delete(RefreshToken).where(RefreshToken.family_id.in_(family_id))
+        )
+
+    async def revoke_user(self, user_id: uuid.UUID) -> None:
+        await self.db.exec(delete(RefreshToken).where(RefreshToken.user_id == user_id))
+
+    async def prune(self, user_id: uuid.UUID) -> None:
+        """Drop a user's expired tokens; used ones stay until then to catch reuse."""
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        await self.db.exec(
+            delete(RefreshToken).where(
+                RefreshToken.user_id == user_id, RefreshToken.expires_at <= now
+            )
+        )
@@ -0,0 +1,232 @@
+import asyncio
+import datetime
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import delete
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from auth.rbac import invalidate_scopes
+from config.settings import settings
+from db.engine import async_engine
+from db.tables import Revocation
+
+logger = logging.getLogger(__name__)
+
+# Revocations are read back from a little before the last sync, so rows
+# committed late or stamped by a node with a lagging clock aren't skipped
+SYNC_OVERLAP = 60
+
+
+class RevocationEpochs:
+    """Per-user cutoffs for token verification.
+
+    Revoking a user records the current time; any token of theirs issued before
+    it is rejected. Tokens carry a sub-second iat, so one issued right after a
+    revocation, e.g. on logging in again, is not caught by it. Entries older
+    than JWT_TOKEN_EXPIRATION_TIME can no longer match a live token and are
+    pruned.
+    """
+
+    def __init__(self, max_age: int) -> None:
+        self.max_age = max_age
+        self._epochs: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def revoke(
+        self, user_ids: Iterable[uuid.UUID], epoch: Optional[float] = None
+    ) -> None:
+        epoch = time.time() if epoch is None else epoch
+        with self._lock:
+            for user_id in user_ids:
+                user_id = str(user_id)
+                self._epochs[user_id] = max(epoch, self._epochs.get(user_id, epoch))
+
+    def prune(self) -> None:
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            self._epochs = {
+                user_id: epoch
+                for user_id, epoch in self._epochs.items()
+                if epoch > cutoff
+            }
+
+    def is_revoked(self, payload: Dict) -> bool:
+        epoch = self._epochs.get(payload["sub"])
+        return epoch is not None and payload["iat"] < epoch
+
+
+class RevokedTokens:
+    """jti -> exp of single revoked tokens that haven't expired yet.
+
+    Only revoked tokens are held, so the set stays small and a check is one
+    dict lookup. Entries are dropped once their token has expired.
+    """
+
+    def __init__(self) -> None:
+        self._tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, jti: str, exp: int) -> None:
+        with self._lock:
+            self._tokens[jti] = exp
+
+    def prune(self) -> None:
+        now = int(time.time())
+        with self._lock:
+            self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        return jti is not None and jti in self._tokens
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+
+revocation_epochs = RevocationEpochs(settings.JWT_TOKEN_EXPIRATION_TIME)
+revoked_tokens = RevokedTokens()
+
+
+def is_revoked(payload: Dict) -> bool:
+    """Whether a verified token was revoked, by its jti or its user."""
+    jti = payload.get("jti")
+    return revoked_tokens.is_revoked(jti) or revocation_epochs.is_revoked(payload)
+
+
+def _utc(timestamp: float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+
+
+class Revocations:
+    """Records revocations for every worker, and applies them to this one.
+
+    Rows live until the tokens they cover have expired; other workers pick
+    them up within REVOCATION_SYNC_INTERVAL (see RevocationSync). The caller
+    commits.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def revoke_token(self, jti: str, user_id: uuid.UUID, exp: int) -> None:
+        self.db.add(
+            Revocation(
+                jti=jti,
+                user_id=user_id,
+                revoked_at=_utc(time.time()),
+                expires_at=_utc(exp),
+            )
+        )
+        revoked_tokens.revoke(jti, exp)
+
+    async def revoke_users(self, user_ids: Iterable[uuid.UUID]) -> None:
+        """Revoke every token issued to the users so far."""
+        now = time.time()
+        user_ids = list(user_ids)
+        self.db.add_all(
+            Revocation(
+                user_id=user_id,
+                revoked_at=_utc(now),
+                expires_at=_utc(now + settings.JWT_TOKEN_EXPIRATION_TIME),
+            )
+            for user_id in user_ids
+        )
+        revocation_epochs.revoke(user_ids, now)
+
+    async def revoke_stale_scopes(self, user_ids: Iterable[uuid.UUID]) -> None:
+        """After the users lost scopes.
+
+        Stateless verification trusts the scopes in a token, so every token
+        of theirs is revoked. Strict verification reads scopes per request,
+        so only the cached ones are dropped.
+        """
+        if settings.TOKEN_VERIFICATION_MODE == "stateless":
+            await self.revoke_users(user_ids)
+        else:
+            await self.refresh_scopes(user_ids)
+
+    async def refresh_scopes(self, user_ids: Iterable[uuid.UUID]) -> None:
+        """Have every worker drop the users' cached scopes; revokes no token.
+
+        The rows only need to outlive the cache entries they invalidate. The
+        caller still invalidates this worker's cache once it has committed.
+        """
+        now = time.time()
+        self.db.add_all(
+            Revocation(
+                user_id=user_id,
+                revoked_at=_utc(now),
+                expires_at=_utc(now + settings.SCOPE_CACHE_TTL),
+                scopes_only=True,
+            )
+            for user_id in user_ids
+        )
+
+
+class RevocationSync:
+    """Loads revocations recorded by other workers into this one's memory.
+
+    Users revoked or marked scopes_only also have their cached scopes
+    dropped, so a role or permission change reaches every worker within
+    REVOCATION_SYNC_INTERVAL in either verification mode.
+    """
+
+    def __init__(self) -> None:
+        self._since: Optional[float] = None
+        # Rows read last time; the overlap reads them again
+        self._seen: Set[uuid.UUID] = set()
+
+    async def sync(self) -> int:
+        """Apply new revocations and prune expired ones; returns how many read."""
+        now = time.time()
+        # The first sync loads every revocation still in force
+        since = self._since or now - settings.JWT_TOKEN_EXPIRATION_TIME
+        async with AsyncSession(async_engine) as db:
+            result = await db.exec(
+                select(
+                    Revocation.id,
+                    Revocation.jti,
+                    Revocation.user_id,
+                    Revocation.revoked_at,
+                    Revocation.expires_at,
+                    Revocation.scopes_only,
+                ).where(
+                    Revocation.revoked_at > _utc(since),
+                    Revocation.expires_at > _utc(now),
+                )
+            )
+            rows = result.all()
+            await db.exec(delete(Revocation).where(Revocation.expires_at <= _utc(now)))
+            await db.commit()
+        stale_scopes = set()
+        for row_id, jti, user_id, revoked_at, expires_at, scopes_only in rows:
+            if jti is not None:
+                revoked_tokens.revoke(jti, int(expires_at.timestamp()))
+                continue
+            if not scopes_only:
+                revocation_epochs.revoke([user_id], revoked_at.timestamp())
+            # A revoked user logging in again must not get stale scopes either
+            if row_id not in self._seen:
+                stale_scopes.add(user_id)
+        invalidate_scopes(stale_scopes)
+        self._seen = {row[0] for row in rows}
+        revoked_tokens.prune()
+        revocation_epochs.prune()
+        self._since = now - SYNC_OVERLAP
+        return len(rows)
+
+    async def run(self) -> None:
+        """Sync every REVOCATION_SYNC_INTERVAL seconds, until cancelled."""
+        while True:
+            await asyncio.sleep(settings.REVOCATION_SYNC_INTERVAL)
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Revocation sync failed")
+
+
+revocation_sync = RevocationSync()
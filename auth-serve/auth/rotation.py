@@ -0,0 +1,106 @@
+"""Scheduled signing key rotation.
+
+Each run, under the key backend's lock, shared by every worker and node:
+
+- Once the current key has signed for KEY_ROTATION_INTERVAL less the publish
+  lead, the next key is made and published in the JWKS, but not used.
+- Once the interval is up and the next key has been published for the lead,
+  signing switches to it and the old key is retired.
+- Retired keys are deleted once every token they could have signed has
+  expired.
+
+So the JWKS holds the current key plus at most one published and one retired
+key, and a verifier has always seen a kid before any token carries it. The
+server runs this every KEY_ROTATION_CHECK_INTERVAL seconds; it can also be run
+from the auth-serve directory, e.g. from cron:
+
+    uv run python -m auth.rotation
+"""
+
+import asyncio
+import logging
+import time
+from typing import List
+
+from auth.keystore import KeyStore
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def publish_lead() -> int:
+    """Seconds a key is published before it signs.
+
+    Never less than it takes a verifier's cached JWKS to expire and the other
+    workers' key caches to reload.
+    """
+    return max(
+        settings.KEY_ROTATION_LEAD,
+        settings.JWKS_MAX_AGE + settings.KEY_CACHE_REFRESH_INTERVAL,
+    )
+
+
+def retention() -> int:
+    """Seconds a retired key stays published.
+
+    Workers keep signing with it until their signing key cache reloads, and
+    each of those tokens lives JWT_TOKEN_EXPIRATION_TIME.
+    """
+    return settings.JWT_TOKEN_EXPIRATION_TIME + settings.KEY_CACHE_REFRESH_INTERVAL
+
+
+def rotate_keys() -> List[str]:
+    """Run one rotation step; returns what was done, e.g. ["published <kid>"]."""
+    ks = KeyStore()
+    done = []
+    with ks.backend.lock():
+        now = time.time()
+        current = ks.current_kid()
+        if current is None:
+            return [f"created {ks.create_keypair()}"]
+        metadata = ks.key_metadata()
+
+        interval = settings.KEY_ROTATION_INTERVAL
+        # Published and never used; keys adopted as retired never signed either
+        pending = sorted(
+            (m.created_at, kid)
+            for kid, m in metadata.items()
+            if m.activated_at is None and m.retired_at is None
+        )
+        if interval:
+            age = now - metadata[current].activated_at
+            if not pending:
+                if age >= interval - publish_lead():
+                    done.append(f"published {ks.create_keypair(activate=False)}")
+            elif age >= interval and now - pending[0][0] >= publish_lead():
+                current = pending[0][1]
+                ks.activate(current)
+                done.append(f"activated {current}")
+
+        for kid, m in metadata.items():
+            if kid == current or m.retired_at is None:
+                continue
+            if now - m.retired_at >= retention():
+                ks.delete_keypair(kid)
+                done.append(f"pruned {kid}")
+    return done
+
+
+async def run_key_rotation() -> None:
+    """Rotate keys every KEY_ROTATION_CHECK_INTERVAL seconds, until cancelled."""
+    while True:
+        try:
+            for action in await asyncio.to_thread(rotate_keys):
+                logger.info("Signing keys: %s", action)
+        except Exception:
+            logger.exception("Signing key rotation failed")
+        await asyncio.sleep(settings.KEY_ROTATION_CHECK_INTERVAL)
+
+
+def main():
+    for action in rotate_keys():
+        print(action)
+
+
+if __name__ == "__main__":
+    main()
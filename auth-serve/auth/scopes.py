@@ -0,0 +1,137 @@
+import base64
+import hashlib
+import uuid
+from typing import Dict, Iterable, List, Tuple
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+from config.settings import settings
+from utils.cache import TTLCache
+from utils.seed import get_system_permissions
+
+# Versions remembered per dictionary by `covers`; they come from tokens
+MAX_COVERED_VERSIONS = 64
+
+
+def _version(slugs: Tuple[str, ...]) -> str:
+    digest = hashlib.sha256("\n".join(slugs).encode()).hexdigest()[:12]
+    return f"{len(slugs)}-{digest}"
+
+
+class PermissionDictionary:
+    """Assigns each permission slug of an org a bit, so scope sets are ints.
+
+    The global catalog always takes the low bits in seed order, so a catalog
+    mask means the same in every org. The org's own permissions follow in id
+    order, so creating one only appends a bit. `version` is the slug count
+    and a hash of the slugs: a mask made under one version means the same
+    under any dictionary that `covers` it, and only deleting a permission
+    invalidates it.
+    """
+
+    def __init__(self, slugs: Iterable[str]) -> None:
+        self.slugs: Tuple[str, ...] = tuple(dict.fromkeys(slugs))
+        self.bits: Dict[str, int] = {s: 1 << i for i, s in enumerate(self.slugs)}
+        self.all = (1 << len(self.slugs)) - 1
+        self.version = _version(self.slugs)
+        self._compiled: Dict[frozenset, int] = {}
+        self._covered: Dict[str, bool] = {self.version: True}
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self.bits
+
+    def mask(self, slugs: Iterable[str]) -> int:
+        """Bits of the given slugs; slugs outside the dictionary are dropped."""
+        mask = 0
+        for slug in slugs:
+            mask |= self.bits.get(slug, 0)
+        return mask
+
+    def compile(self, slugs: frozenset) -> int:
+        """`mask`, memoized for sets that are checked over and over."""
+        mask = self._compiled.get(slugs)
+        if mask is None:
+            mask = self._compiled[slugs] = self.mask(slugs)
+        return mask
+
+    def covers(self, version: str) -> bool:
+        """Whether the dictionary of `version` is a prefix of this one."""
+        covered = self._covered.get(version)
+        if covered is None:
+            count, _, _ = version.partition("-")
+            covered = (
+                count.isdigit()
+                and int(count) <= len(self.slugs)
+                and _version(self.slugs[: int(count)]) == version
+            )
+            if len(self._covered) < MAX_COVERED_VERSIONS:
+                self._covered[version] = covered
+        return covered
+
+    def slugs_of(self, mask: int) -> List[str]:
+        return [s for i, s in enumerate(self.slugs) if mask >> i & 1]
+
+    def extend(self, slugs: Iterable[str]) -> "PermissionDictionary":
+        return PermissionDictionary(self.slugs + tuple(slugs))
+
+
+def encode_mask(mask: int) -> str:
+    """A mask as unpadded base64url of its big-endian bytes, for tokens."""
+    raw = mask.to_bytes((mask.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_mask(value: str) -> int:
+    raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+    return int.from_bytes(raw, "big")
+
+
+CATALOG = PermissionDictionary(p["slug"] for p in get_system_permissions())
+
+# org_id -> PermissionDictionary
+dictionary_cache = TTLCache(
+    maxsize=settings.SCOPE_CACHE_SIZE, ttl=settings.SCOPE_CACHE_TTL
+)
+
+
+def invalidate_dictionary(org_id: uuid.UUID) -> None:
+    """Drop an org's dictionary, to be called once its permissions change."""
+    dictionary_cache.pop(org_id)
+
+
+class ScopeRequirement:
+    """The scopes a route accepts, any one of which grants access."""
+
+    def __init__(self, scopes: Iterable[str]) -> None:
+        self.scopes = frozenset(scopes)
+        # Requirements on catalog scopes only compile once for every org
+        self.catalog_only = all(s in CATALOG for s in self.scopes)
+        self.catalog_mask = CATALOG.mask(self.scopes)
+
+    def mask(self, dictionary: PermissionDictionary) -> int:
+        if self.catalog_only:
+            return self.catalog_mask
+        return dictionary.compile(self.scopes)
+
+
+_requirements: Dict[Tuple[str, ...], ScopeRequirement] = {}
+
+
+def get_requirement(scopes: Iterable[str]) -> ScopeRequirement:
+    key = tuple(scopes)
+    requirement = _requirements.get(key)
+    if requirement is None:
+        requirement = _requirements[key] = ScopeRequirement(key)
+    return requirement
+
+
+def compile_route_requirements(app: FastAPI) -> int:
+    """Compile the scopes of every route's Security dependencies up front."""
+    stack = [r.dependant for r in app.routes if isinstance(r, APIRoute)]
+    while stack:
+        dependant = stack.pop()
+        if dependant.security_scopes:
+            get_requirement(dependant.security_scopes)
+        stack.extend(dependant.dependencies)
+    return len(_requirements)
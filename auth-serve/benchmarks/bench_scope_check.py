@@ -0,0 +1,62 @@
+"""Scope checks per second, slug set intersection vs permission bitmasks.
+
+Models the per-request work in get_current_user for a user holding many
+permissions: intersect the user's scopes with the token's and test the route's
+requirement. Run from the auth-serve directory:
+
+    uv run python -m benchmarks.bench_scope_check -p 300
+"""
+
+import argparse
+import time
+
+from auth.scopes import CATALOG, get_requirement
+
+
+def checks_per_second(check, iterations: int) -> float:
+    check()  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        check()
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=100_000)
+    parser.add_argument("-p", "--permissions", type=int, default=300)
+    args = parser.parse_args()
+
+    custom = [f"svc{i // 10}.res{i % 10}.read" for i in range(args.permissions)]
+    dictionary = CATALOG.extend(custom)
+    held = frozenset(dictionary.slugs)
+    token_scopes = list(dictionary.slugs)
+    route_scopes = ["auth.role.write", "auth.role.all"]
+
+    def with_sets():
+        granted = held & set(token_scopes)
+        return bool(set(route_scopes) & granted)
+
+    requirement = get_requirement(route_scopes)
+    held_mask = dictionary.mask(held)
+
+    def with_masks():
+        granted = held_mask & dictionary.mask(token_scopes)
+        return bool(requirement.mask(dictionary) & granted)
+
+    token_mask = dictionary.mask(token_scopes)
+
+    def with_mask_claim():
+        # Token carrying its scopes as a mask rather than a slug list
+        return bool(requirement.mask(dictionary) & held_mask & token_mask)
+
+    assert with_sets() and with_masks() and with_mask_claim()
+    before = checks_per_second(with_sets, args.iterations)
+    print(f"slug sets:   {before:12.0f} checks/s")
+    for label, check in [("masks:", with_masks), ("mask claim:", with_mask_claim)]:
+        rate = checks_per_second(check, args.iterations)
+        print(f"{label:12} {rate:12.0f} checks/s  ({rate / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
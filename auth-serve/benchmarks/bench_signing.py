@@ -0,0 +1,106 @@
+"""Tokens per second signed and verified with each supported key type.
+
+Keys are preloaded as in login and validate_access_token, so this is the
+per-token cost of each algorithm. `--from-disk` also times signing the way
+it was done before the signing key was preloaded, reading and parsing the
+PEM for every token. Run from the auth-serve directory:
+
+    uv run python -m benchmarks.bench_signing
+    uv run python -m benchmarks.bench_signing --from-disk
+"""
+
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+import jwt
+
+from auth import key_backends
+from auth.key_backends import FileKeyBackend
+from auth.keystore import KeyStore, public_key_cache, signing_key_cache
+from config.settings import settings
+from models.rbac import JWTPayload
+
+
+def _payload() -> dict:
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    return JWTPayload(
+        sub="00000000-0000-0000-0000-000000000000",
+        org="00000000-0000-0000-0000-000000000000",
+        exp=now + datetime.timedelta(hours=2),
+        iat=now.timestamp(),
+        scopes=["auth.user.read", "auth.role.read", "auth.permission.read"],
+    ).model_dump(exclude_none=True)
+
+
+def sign_from_disk() -> str:
+    """The old path: new KeyStore, read kid + PEM, let PyJWT parse the PEM."""
+    kid, private_pem = KeyStore().get_current_signing_key()
+    algorithm = signing_key_cache.get()[2]
+    return jwt.encode(
+        _payload(), private_pem, algorithm=algorithm, headers={"kid": kid}
+    )
+
+
+def sign_preloaded() -> str:
+    kid, private_key, algorithm = signing_key_cache.get()
+    return jwt.encode(
+        _payload(), private_key, algorithm=algorithm, headers={"kid": kid}
+    )
+
+
+def verify_preloaded(token: str) -> dict:
+    """What validate_access_token does once the header is read."""
+    kid = jwt.get_unverified_header(token)["kid"]
+    public_key, algorithm = public_key_cache.get(kid)
+    return jwt.decode(token, public_key, algorithms=[algorithm])
+
+
+def per_second(fn, iterations: int) -> float:
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=2000)
+    parser.add_argument(
+        "--from-disk",
+        action="store_true",
+        help="also time signing with the key read from disk per token",
+    )
+    args = parser.parse_args()
+
+    # Work against a throwaway key directory so ./.keys is left alone, and
+    # never against shared keys, e.g. with KEY_BACKEND=postgres
+    os.chdir(tempfile.mkdtemp(prefix="auth-serve-bench-"))
+    settings.KEY_BACKEND = "file"
+    key_backends.key_backend = FileKeyBackend()
+
+    baseline = None
+    for algorithm in ["RS256", "ES256", "EdDSA"]:
+        KeyStore().create_keypair(algorithm)
+        token = sign_preloaded()
+
+        signed = per_second(sign_preloaded, args.iterations)
+        verified = per_second(lambda t=token: verify_preloaded(t), args.iterations)
+        baseline = baseline or (signed, verified)
+        print(
+            f"{algorithm + ':':7} sign {signed:9.0f}/s ({signed / baseline[0]:5.1f}x)"
+            f"  verify {verified:9.0f}/s ({verified / baseline[1]:5.1f}x)"
+        )
+        if args.from_disk:
+            from_disk = per_second(sign_from_disk, args.iterations)
+            print(
+                f"{'':7} sign from disk {from_disk:9.0f}/s"
+                f" (preloaded is {signed / from_disk:5.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Signups per second for the ways of giving a new org its default ACL.
+
+Per-org copies made with ORM flushes or one set-based statement, against
+linking the owner to the global catalog. Each signup runs in a transaction
+that is rolled back, so the database is left as it was. Password hashing is
+left out; it is measured by `utils.calibrate`. Needs a reachable database.
+Run from the auth-serve directory:
+
+    uv run python -m benchmarks.bench_signup
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from auth.rbac import RBAC
+from db.engine import async_engine
+from db.tables import Organization, Permission, Role, RolePermission, User, UserRole
+from models.rbac import SystemRole
+from utils.seed import ROLE_PERMISSION_MAP, get_system_permissions, get_system_roles
+
+
+async def seed_orm(db: AsyncSession, org: Organization, user: User) -> None:
+    """The old path: a flush per table and a separate owner link."""
+    roles = [Role(**r) for r in get_system_roles(org.id)]
+    db.add_all(roles)
+    await db.flush()
+    role_ids = {r.name: r.id for r in roles}
+
+    permissions = [Permission(**p) for p in get_system_permissions(org.id)]
+    db.add_all(permissions)
+    await db.flush()
+    permission_ids = {p.slug: p.id for p in permissions}
+
+    db.add_all(
+        RolePermission(role_id=role_ids[name], permission_id=permission_ids[slug])
+        for name, slugs in ROLE_PERMISSION_MAP.items()
+        for slug in slugs
+    )
+    await db.flush()
+    db.add(UserRole(user_id=user.id, role_id=role_ids[SystemRole.owner.value]))
+    await db.flush()
+
+
+async def seed_set_based(db: AsyncSession, org: Organization, user: User) -> None:
+    await RBAC(db).seed_org_acl(org_id=org.id, owner_user_id=user.id)
+
+
+async def seed_catalog(db: AsyncSession, org: Organization, user: User) -> None:
+    """What signup does now: link the owner to the global catalog."""
+    await RBAC(db).add_owner(user.id)
+
+
+async def signup(seed, n: int) -> None:
+    org = Organization(name=f"bench-{n}", domain=f"bench-{n}.example.com")
+    user = User(
+        org_id=org.id,
+        username=f"bench-signup-{n}",
+        password="x",
+        primary_email=f"bench-signup-{n}@example.com",
+    )
+    async with AsyncSession(async_engine, expire_on_commit=False) as db:
+        db.add(org)
+        db.add(user)
+        await db.flush()
+        await seed(db, org, user)
+        await db.rollback()
+
+
+async def signups_per_second(seed, iterations: int, concurrency: int) -> float:
+    await signup(seed, -1)  # warm up
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(n: int) -> None:
+        async with semaphore:
+            await signup(seed, n)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(iterations)))
+    return iterations / (time.perf_counter() - start)
+
+
+async def run(args) -> None:
+    async with AsyncSession(async_engine) as db:
+        await RBAC(db).seed_system_catalog()
+
+    baseline = None
+    for label, seed in [
+        ("orm flushes", seed_orm),
+        ("set-based", seed_set_based),
+        ("catalog", seed_catalog),
+    ]:
+        rate = await signups_per_second(seed, args.iterations, args.concurrency)
+        baseline = baseline or rate
+        print(f"{label + ':':12} {rate:10.1f} signups/s  ({rate / baseline:.2f}x)")
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=500)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""Benchmark suite for the auth hot paths, with results as JSON.
+
+Runs the app in-process (no HTTP server, no network) against the database in
+the DATABASE_* settings, e.g. the one from `make db-start` with migrations
+applied. Each grid point gets its own org whose user holds `--roles` custom
+roles of `--permissions` permissions each, plus the owner role, and is
+deleted afterwards. Signing keys live in a throwaway directory, whatever
+KEY_BACKEND says, and grow to each `--keys` count in turn; key rotation and
+revocation sync don't run. Run from the auth-serve directory:
+
+    uv run python -m benchmarks.bench_suite -o bench.json
+    uv run python -m benchmarks.bench_suite --compare bench.json
+
+Results go to `-o` (or stdout) as JSON: one row per benchmark and grid point
+with throughput and latency percentiles, plus the commit and the settings
+that shape the numbers. `--compare` prints throughput ratios against an
+earlier run.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from sqlmodel import Session, delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from auth import key_backends
+from auth.key_backends import FileKeyBackend
+from auth.keystore import KeyStore
+from auth.rbac import RBAC
+from auth.refresh import RefreshTokens
+from config.settings import settings
+from db.engine import async_engine, engine
+from db.tables import (
+    Organization,
+    Permission,
+    Project,
+    Role,
+    RolePermission,
+    User,
+    UserRole,
+)
+from main import app, on_shutdown, on_startup
+from models.rbac import PermissionActions, RoleType, SystemRole
+from utils import Hasher
+
+PASSWORD = "bench-password"
+
+# Settings recorded with every run, since they change what is measured
+RECORDED_SETTINGS = [
+    "TOKEN_VERIFICATION_MODE",
+    "TOKEN_SCOPE_FORMAT",
+    "JWT_SIGNING_ALGORITHM",
+    "PASSWORD_HASH_SCHEME",
+    "PASSWORD_HASH_ROUNDS",
+    "DB_POOL_SIZE",
+]
+
+
+@dataclass
+class Fixture:
+    org_id: uuid.UUID
+    username: str
+    roles: int
+    permissions: int
+
+
+def create_fixture(roles: int, permissions: int, password_hash: str) -> Fixture:
+    tag = uuid.uuid4().hex[:8]
+    with Session(engine) as db:
+        org = Organization(name=f"bench-{tag}", domain=f"bench-{tag}.example.com")
+        user = User(
+            org_id=org.id,
+            username=f"bench-{tag}",
+            password=password_hash,
+            primary_email=f"bench-{tag}@example.com",
+        )
+        db.add(org)
+        db.add(user)
+        custom_roles = [
+            Role(name=f"bench-role-{r}", type=RoleType.custom, org_id=org.id)
+            for r in range(roles)
+        ]
+        custom_permissions = [
+            [
+                Permission(
+                    service=f"bench{r}",
+                    resource=f"res{p}",
+                    action=PermissionActions.read,
+                    slug=f"bench{r}.res{p}.read",
+                    org_id=org.id,
+                )
+                for p in range(permissions)
+            ]
+            for r in range(roles)
+        ]
+        db.add_all(custom_roles)
+        db.add_all(p for per_role in custom_permissions for p in per_role)
+        db.flush()
+
+        owner_id = db.exec(
+            select(Role.id).where(
+                Role.name == SystemRole.owner.value, Role.org_id.is_(None)
+            )
+        ).one()
+        db.add(UserRole(user_id=user.id, role_id=owner_id))
+        for role, per_role in zip(custom_roles, custom_permissions, strict=True):
+            db.add(UserRole(user_id=user.id, role_id=role.id))
+            db.add_all(
+                RolePermission(role_id=role.id, permission_id=p.id) for p in per_role
+            )
+        db.commit()
+        return Fixture(org.id, user.username, roles, permissions)
+
+
+def drop_fixture(fixture: Fixture) -> None:
+    # Role and user links cascade
+    with Session(engine) as db:
+        for table in [Permission, Role, User, Project]:
+            db.exec(delete(table).where(table.org_id == fixture.org_id))
+        db.exec(delete(Organization).where(Organization.id == fixture.org_id))
+        db.commit()
+
+
+async def measure(
+    call: Callable[[], Awaitable[bool]], iterations: int, concurrency: int
+) -> Dict:
+    """Run `call` `iterations` times over `concurrency` workers.
+
+    `call` returns whether the operation succeeded; failures are counted and
+    still timed.
+    """
+    await call()  # warm up
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(iterations))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            ok = await call()
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(q: float) -> float:
+        return round(
+            latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 3
+        )
+
+    return {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "errors": errors,
+        "ops_per_sec": round(iterations / elapsed, 1),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+async def bench_grid_point(
+    client: httpx.AsyncClient, fixture: Fixture, keys: int, args
+) -> List[Dict]:
+    async def login() -> Optional[str]:
+        response = await client.post(
+            "/user/login", data={"username": fixture.username, "password": PASSWORD}
+        )
+        if response.status_code != 200:
+            return None
+        return response.json()["access_token"]
+
+    token = await login()
+    if token is None:
+        raise SystemExit(f"Benchmark login failed for {fixture.username}")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def get(path: str) -> Callable[[], Awaitable[bool]]:
+        async def call() -> bool:
+            response = await client.get(path, headers=headers)
+            return response.status_code == 200
+
+        return call
+
+    async def login_ok() -> bool:
+        return await login() is not None
+
+    # One refresh token chain per worker; each refresh swaps in its successor
+    refresh_tokens = deque()
+    async with AsyncSession(async_engine) as db:
+        user_id = (
+            await db.exec(select(User.id).where(User.username == fixture.username))
+        ).one()
+        for _ in range(args.concurrency + 1):
+            refresh_tokens.append(await RefreshTokens(db).issue(user_id, []))
+        await db.commit()
+
+    async def refresh_ok() -> bool:
+        response = await client.post(
+            "/user/token/refresh", data={"refresh_token": refresh_tokens.popleft()}
+        )
+        if response.status_code != 200:
+            return False
+        refresh_tokens.append(response.json()["refresh_token"])
+        return True
+
+    cases = [
+        ("login", login_ok, args.login_iterations),
+        ("refresh", refresh_ok, args.iterations),
+        ("authenticated", get("/user/me"), args.iterations),
+        ("jwks", get("/.well-known/jwks.json"), args.iterations),
+        ("list_roles", get("/role/"), args.iterations),
+        ("list_permissions", get("/permission/"), args.iterations),
+    ]
+    rows = []
+    for name, call, iterations in cases:
+        result = await measure(call, iterations, args.concurrency)
+        rows.append(
+            {
+                "benchmark": name,
+                "keys": keys,
+                "roles": fixture.roles,
+                "permissions": fixture.permissions,
+                **result,
+            }
+        )
+        report(rows[-1])
+    return rows
+
+
+async def bench_seed_org_acl(fixture: Fixture, args) -> Dict:
+    """The set-based per-org ACL copy, in transactions that are rolled back."""
+
+    async def seed() -> bool:
+        async with AsyncSession(async_engine) as db:
+            await RBAC(db).seed_org_acl(org_id=fixture.org_id)
+            await db.rollback()
+        return True
+
+    result = await measure(seed, args.iterations, args.concurrency)
+    row = {
+        "benchmark": "seed_org_acl",
+        "keys": None,
+        "roles": None,
+        "permissions": None,
+        **result,
+    }
+    report(row)
+    return row
+
+
+def report(row: Dict) -> None:
+    point = " ".join(
+        f"{k}={row[k]}" for k in ["keys", "roles", "permissions"] if row[k] is not None
+    )
+    print(
+        f"{row['benchmark']:17} {point:30} {row['ops_per_sec']:10.1f} ops/s"
+        f"  p50 {row['p50_ms']:8.2f} ms  p99 {row['p99_ms']:8.2f} ms"
+        f"  errors {row['errors']}",
+        file=sys.stderr,
+    )
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(rows: List[Dict], path: str) -> None:
+    def key(row: Dict) -> tuple:
+        return (row["benchmark"], row["keys"], row["roles"], row["permissions"])
+
+    with open(path) as f:
+        before = {key(row): row for row in json.load(f)["results"]}
+    print(f"\ncompared with {path}:", file=sys.stderr)
+    for row in rows:
+        old = before.get(key(row))
+        if old:
+            ratio = row["ops_per_sec"] / old["ops_per_sec"]
+            print(f"{' '.join(map(str, key(row))):40} {ratio:6.2f}x", file=sys.stderr)
+
+
+async def run(args) -> Dict:
+    await on_startup()
+    # Cancelled before their first step, so nothing rotates keys or syncs
+    # revocations under the measurements
+    await on_shutdown()
+    password_hash = Hasher().get_password_hash(PASSWORD)
+    keystore = KeyStore()
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for keys in sorted(args.keys):
+            while len(keystore.list_public_keys()) < keys:
+                keystore.create_keypair()
+            for roles in args.roles:
+                for permissions in args.permissions:
+                    fixture = create_fixture(roles, permissions, password_hash)
+                    try:
+                        results += await bench_grid_point(client, fixture, keys, args)
+                    finally:
+                        drop_fixture(fixture)
+        fixture = create_fixture(0, 0, password_hash)
+        try:
+            results.append(await bench_seed_org_acl(fixture, args))
+        finally:
+            drop_fixture(fixture)
+    await async_engine.dispose()
+
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {name: getattr(settings, name) for name in RECORDED_SETTINGS},
+        "results": results,
+    }
+
+
+def int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--iterations", type=int, default=500)
+    parser.add_argument(
+        "--login-iterations",
+        type=int,
+        default=20,
+        help="login is bound by password hashing, so it gets fewer",
+    )
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--keys", type=int_list, default=[1, 16])
+    parser.add_argument("--roles", type=int_list, default=[1, 8])
+    parser.add_argument("--permissions", type=int_list, default=[8, 64])
+    parser.add_argument("-o", "--output", help="write JSON here, not to stdout")
+    parser.add_argument("--compare", help="JSON from an earlier run")
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    if args.compare:
+        args.compare = os.path.abspath(args.compare)
+
+    # Work against a throwaway key directory so ./.keys is left alone, and
+    # never against shared keys, e.g. with KEY_BACKEND=postgres
+    os.chdir(tempfile.mkdtemp(prefix="auth-serve-bench-"))
+    settings.KEY_BACKEND = "file"
+    key_backends.key_backend = FileKeyBackend()
+    summary = asyncio.run(run(args))
+
+    output = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        compare(summary["results"], args.compare)
+
+
+if __name__ == "__main__":
+    main()
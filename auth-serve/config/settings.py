@@ -1,4 +1,5 @@
 import os
+from typing import Dict, Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -15,8 +16,95 @@ class Settings(BaseSettings):
     DATABASE_PORT: str = os.getenv("DATABASE_PORT", "5432")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "postgres")
 
+    # Connection pool, per worker process
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    # Recycle connections older than this many seconds; -1 never recycles
+    DB_POOL_RECYCLE: int = 30 * MIN
+    DB_POOL_PRE_PING: bool = False
+    # asyncpg prepared statement cache, per connection
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Set when connecting through pgbouncer in transaction pooling mode:
+    # prepared statements are disabled since a connection can change backends
+    # between transactions.
+    DB_PGBOUNCER: bool = False
+    # Separate pool for signing keys with KEY_BACKEND=postgres: the background
+    # reload, a reload for an unknown kid, and a rotation step's two
+    KEY_DB_POOL_SIZE: int = 4
+
     # JWT Settings
     JWT_TOKEN_EXPIRATION_TIME: int = 2 * HOUR
+    # Algorithm of keypairs made by KeyStore.create_keypair. Each kid keeps the
+    # algorithm of its own key, so tokens signed before a switch still verify.
+    # ES256 (P-256) and EdDSA (Ed25519) sign far faster than RS256.
+    JWT_SIGNING_ALGORITHM: Literal["RS256", "ES256", "EdDSA"] = "RS256"
+    # Where signing keys live: "file" (./.keys) or "postgres" (shared by every
+    # node; migration 0006). See auth/key_backends.py.
+    KEY_BACKEND: Literal["file", "postgres"] = "file"
+    # How often a background task polls the key backend for rotations and
+    # reloads the in-memory key caches; requests never wait on the backend
+    KEY_CACHE_REFRESH_INTERVAL: int = 30
+    # Scheduled rotation (auth/rotation.py): a new key signs every
+    # KEY_ROTATION_INTERVAL seconds (0 turns it off; retired keys are still
+    # pruned), published in the JWKS KEY_ROTATION_LEAD seconds beforehand.
+    # Keep the interval above JWT_TOKEN_EXPIRATION_TIME so the JWKS stays at
+    # two or three keys.
+    KEY_ROTATION_INTERVAL: int = 7 * DAY
+    KEY_ROTATION_LEAD: int = 1 * HOUR
+    KEY_ROTATION_CHECK_INTERVAL: int = 5 * MIN
+    # Cache-Control max-age of /.well-known/jwks.json. Verifiers refetch on an
+    # unknown kid anyway, so this only bounds how long a removed key lingers.
+    JWKS_MAX_AGE: int = 5 * MIN
+    # "strict" checks the user is active and reloads their scopes on every
+    # request, through a cache that ACL changes clear on every worker within
+    # REVOCATION_SYNC_INTERVAL. "stateless" trusts the token's sub, org and
+    # scopes until exp, apart from users revoked in this worker's memory
+    # after losing a role or permission.
+    TOKEN_VERIFICATION_MODE: Literal["strict", "stateless"] = "strict"
+    # "list" puts granted slugs in the `scopes` claim. "mask" sends them as a
+    # bitmask over the org's permission dictionary (`scope_mask`, versioned
+    # by `scope_version`), resolvable from GET /permission/dictionary, which
+    # keeps tokens small for users holding many permissions.
+    TOKEN_SCOPE_FORMAT: Literal["list", "mask"] = "list"
+    # Revoked tokens (logout) and users (deactivation) are checked in memory;
+    # each worker polls for revocations made elsewhere this often
+    REVOCATION_SYNC_INTERVAL: int = 5
+    # Refresh tokens are opaque and stored only as an HMAC under this secret.
+    # There is no default: the server won't start until it is set per
+    # deployment (`make secret-init`). Each is single use and is replaced on
+    # refresh, so the lifetime is that of an idle session.
+    REFRESH_TOKEN_SECRET: Optional[str] = None
+    REFRESH_TOKEN_EXPIRATION_TIME: int = 30 * DAY
+
+    # Token introspection (RFC 7662) for services that can't verify JWTs.
+    # Callers authenticate with HTTP Basic as one of these client_id: secret
+    # pairs, given as JSON in the environment; none means the endpoint is
+    # closed. /metrics takes the same credentials. Verified tokens are cached
+    # until they expire.
+    INTROSPECTION_CLIENTS: Dict[str, str] = {}
+    INTROSPECTION_MAX_BATCH: int = 500
+    INTROSPECTION_CACHE_SIZE: int = 100_000
+
+    # Listing endpoints
+    PAGE_SIZE: int = 100
+    MAX_PAGE_SIZE: int = 1000
+
+    # RBAC Settings
+    # Scopes are cached per worker. ACL changes clear the entries on every
+    # worker through the revocation sync; the TTL is a backstop should a
+    # sync fail.
+    SCOPE_CACHE_SIZE: int = 10_000
+    SCOPE_CACHE_TTL: int = 1 * MIN
+
+    # Password hashing. Rounds default to the scheme's own default; run
+    # `python -m utils.calibrate` to pick a value for this machine. Hashes made
+    # with another scheme or cost are upgraded on the user's next login.
+    PASSWORD_HASH_SCHEME: str = "bcrypt"
+    PASSWORD_HASH_ROUNDS: Optional[int] = None
+    # Password hashing pool; 0 workers means one per CPU
+    HASH_WORKERS: int = 0
+    HASH_QUEUE_SIZE: int = 64
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -1,23 +1,82 @@
-from sqlmodel import Session, SQLModel, create_engine
+import uuid
+
+from fastapi import Request
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from config.settings import settings
+from db.pool import InstrumentedQueuePool, InstrumentedSyncQueuePool
 
 DATABASE_URL = (
     f"postgresql://{settings.DATABASE_USER}:{settings.DATABASE_PASSWORD}"
     f"@{settings.DATABASE_HOST}:{settings.DATABASE_PORT}/{settings.DATABASE_NAME}"
 )
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
-engine = create_engine(DATABASE_URL)
 
+def _async_connect_args() -> dict:
+    if settings.DB_PGBOUNCER:
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            # Unnamed statements can collide across pgbouncer clients
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+
+# Sync engine for migrations and scripts; requests use async_engine
+engine = create_engine(DATABASE_URL, pool_pre_ping=settings.DB_POOL_PRE_PING)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args=_async_connect_args(),
+)
+# Signing key I/O (auth/key_backends.py), which runs in threads: background
+# key reloads, reloads for unknown kids, and rotation, which holds a second
+# connection for its advisory lock
+key_engine = create_engine(
+    DATABASE_URL,
+    poolclass=InstrumentedSyncQueuePool,
+    pool_size=settings.KEY_DB_POOL_SIZE,
+    max_overflow=0,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
 
 
 def drop_db_and_tables():
     SQLModel.metadata.drop_all(engine)
+    with engine.begin() as conn:
+        # So that `python -m db.migrate` builds the schema again
+        conn.exec_driver_sql("DROP TABLE IF EXISTS schema_migrations")
+
 
+def pool_stats() -> dict:
+    return async_engine.pool.stats()
 
-def get_session():
-    with Session(engine) as session:
+
+def key_pool_stats() -> dict:
+    return key_engine.pool.stats()
+
+
+async def get_session(request: Request):
+    # FastAPI caches dependencies per security scope, so get_current_user and
+    # the route would each open a session (and hold a pooled connection).
+    # Share one per request instead, or concurrent requests deadlock the pool.
+    session = getattr(request.state, "db", None)
+    if session is not None:
+        yield session
+        return
+    # Keep attributes loaded after commit: an expired attribute would need a
+    # lazy refresh, which AsyncSession cannot do implicitly.
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        request.state.db = session
         yield session
@@ -0,0 +1,143 @@
+"""Apply pending schema migrations from db/migrations.
+
+Run from the auth-serve directory before starting (or upgrading) the server:
+
+    uv run python -m db.migrate
+    uv run python -m db.migrate --status
+"""
+
+import argparse
+import importlib
+import pkgutil
+import re
+import time
+from types import ModuleType
+from typing import List, Tuple
+
+from sqlalchemy import Connection, text
+from sqlalchemy.exc import OperationalError
+
+from db import migrations
+from db.engine import engine
+
+# Held for the whole run so two deploys can't migrate at the same time
+ADVISORY_LOCK_ID = 0x61757468  # "auth"
+
+INDEX_NAME = re.compile(r"INDEX CONCURRENTLY IF NOT EXISTS (\w+)", re.IGNORECASE)
+
+Migration = Tuple[int, str, ModuleType]
+
+
+def discover() -> List[Migration]:
+    found = {}
+    for info in pkgutil.iter_modules(migrations.__path__):
+        version, _, name = info.name.partition("_")
+        if not version.isdigit():
+            continue
+        if int(version) in found:
+            raise SystemExit(f"Duplicate migration version {version}")
+        module = importlib.import_module(f"{migrations.__name__}.{info.name}")
+        if hasattr(module, "statements") == hasattr(module, "indexes"):
+            raise SystemExit(
+                f"Migration {info.name} must define one of statements or indexes"
+            )
+        found[int(version)] = (int(version), name, module)
+    return [found[v] for v in sorted(found)]
+
+
+def applied_versions(conn: Connection) -> set:
+    conn.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version INTEGER PRIMARY KEY,"
+            " name VARCHAR NOT NULL,"
+            " applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())"
+        )
+    )
+    return set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+
+def record(conn: Connection, version: int, name: str) -> None:
+    conn.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+        {"version": version, "name": name},
+    )
+
+
+def build_index(conn: Connection, statement: str) -> None:
+    """Build one index concurrently, replacing what a failed build left behind.
+
+    An interrupted CREATE INDEX CONCURRENTLY leaves an invalid index that IF
+    NOT EXISTS would then skip, so drop it first.
+    """
+    match = INDEX_NAME.search(statement)
+    if not match:
+        raise SystemExit(f"Not a concurrent index build: {statement}")
+    invalid = conn.execute(
+        text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid"
+            " WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": match.group(1)},
+    ).first()
+    if invalid:
+        conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}")
+    conn.exec_driver_sql(statement)
+
+
+def apply(conn: Connection, migration: Migration) -> None:
+    version, name, module = migration
+    if hasattr(module, "statements"):
+        with engine.begin() as tx:
+            for statement in module.statements:
+                tx.exec_driver_sql(statement)
+            record(tx, version, name)
+    else:
+        for statement in module.indexes:
+            build_index(conn, statement)
+        record(conn, version, name)
+
+
+def connect(wait: int) -> Connection:
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            return engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        except OperationalError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--status", action="store_true", help="list migrations and exit"
+    )
+    parser.add_argument(
+        "--wait",
+        type=int,
+        default=0,
+        help="seconds to keep retrying until the database accepts connections",
+    )
+    args = parser.parse_args()
+
+    with connect(args.wait) as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+        applied = applied_versions(conn)
+        for migration in discover():
+            version, name, _ = migration
+            label = f"{version:04d}_{name}"
+            if version in applied:
+                if args.status:
+                    print(f"applied  {label}")
+                continue
+            if args.status:
+                print(f"pending  {label}")
+                continue
+            print(f"applying {label}")
+            apply(conn, migration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Baseline schema, as `SQLModel.metadata.create_all` used to build it at boot.
+
+Every statement is idempotent so databases created that way adopt migrations
+as they are.
+"""
+
+statements = [
+    """
+    DO $$ BEGIN
+        CREATE TYPE orgtype AS ENUM ('ENTERPRISE', 'TEAMS');
+    EXCEPTION WHEN duplicate_object THEN NULL;
+    END $$
+    """,
+    """
+    DO $$ BEGIN
+        CREATE TYPE roletype AS ENUM ('system', 'custom');
+    EXCEPTION WHEN duplicate_object THEN NULL;
+    END $$
+    """,
+    """
+    DO $$ BEGIN
+        CREATE TYPE permissionactions AS ENUM ('read', 'write', 'delete', 'all');
+    EXCEPTION WHEN duplicate_object THEN NULL;
+    END $$
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS organization (
+        name VARCHAR NOT NULL,
+        domain VARCHAR NOT NULL,
+        type orgtype NOT NULL,
+        mfa_enabled BOOLEAN NOT NULL,
+        id UUID NOT NULL,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS permission (
+        action permissionactions NOT NULL,
+        service VARCHAR NOT NULL,
+        resource VARCHAR NOT NULL,
+        slug VARCHAR NOT NULL,
+        description VARCHAR,
+        id SERIAL NOT NULL,
+        org_id UUID NOT NULL,
+        PRIMARY KEY (id),
+        CONSTRAINT uq_permission_slug_org UNIQUE (slug, org_id),
+        FOREIGN KEY (org_id) REFERENCES organization (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_permission_slug ON permission (slug)",
+    """
+    CREATE TABLE IF NOT EXISTS project (
+        name VARCHAR NOT NULL,
+        description VARCHAR NOT NULL,
+        meta JSONB NOT NULL,
+        id UUID NOT NULL,
+        org_id UUID NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE,
+        PRIMARY KEY (id),
+        FOREIGN KEY (org_id) REFERENCES organization (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS role (
+        name VARCHAR NOT NULL,
+        type roletype NOT NULL,
+        id SERIAL NOT NULL,
+        org_id UUID NOT NULL,
+        PRIMARY KEY (id),
+        CONSTRAINT uq_role_name_type_org UNIQUE (name, type, org_id),
+        FOREIGN KEY (org_id) REFERENCES organization (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS "user" (
+        username VARCHAR NOT NULL,
+        password VARCHAR NOT NULL,
+        primary_email VARCHAR NOT NULL,
+        id UUID NOT NULL,
+        org_id UUID NOT NULL,
+        is_active BOOLEAN NOT NULL,
+        PRIMARY KEY (id),
+        UNIQUE (username),
+        UNIQUE (primary_email),
+        FOREIGN KEY (org_id) REFERENCES organization (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS apikey (
+        name VARCHAR NOT NULL,
+        description VARCHAR NOT NULL,
+        key VARCHAR NOT NULL,
+        active BOOLEAN NOT NULL,
+        last_used TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        id UUID NOT NULL,
+        project_id UUID NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY (project_id) REFERENCES project (id)
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_apikey_key ON apikey (key)",
+    """
+    CREATE TABLE IF NOT EXISTS rolepermission (
+        role_id INTEGER NOT NULL,
+        permission_id INTEGER NOT NULL,
+        PRIMARY KEY (role_id, permission_id),
+        FOREIGN KEY (role_id) REFERENCES role (id) ON DELETE CASCADE,
+        FOREIGN KEY (permission_id) REFERENCES permission (id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS userrole (
+        user_id UUID NOT NULL,
+        role_id INTEGER NOT NULL,
+        PRIMARY KEY (user_id, role_id),
+        FOREIGN KEY (user_id) REFERENCES "user" (id) ON DELETE CASCADE,
+        FOREIGN KEY (role_id) REFERENCES role (id) ON DELETE CASCADE
+    )
+    """,
+]
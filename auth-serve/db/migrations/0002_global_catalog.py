@@ -0,0 +1,6 @@
+"""Global system roles and permissions are stored with org_id NULL."""
+
+statements = [
+    "ALTER TABLE role ALTER COLUMN org_id DROP NOT NULL",
+    "ALTER TABLE permission ALTER COLUMN org_id DROP NOT NULL",
+]
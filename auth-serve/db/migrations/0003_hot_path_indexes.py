@@ -0,0 +1,26 @@
+"""Indexes for the lookups in api/routes and auth.rbac."""
+
+indexes = [
+    # One catalog row per name / slug
+    "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_role_name_global"
+    " ON role (name) WHERE org_id IS NULL",
+    "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_permission_slug_global"
+    " ON permission (slug) WHERE org_id IS NULL",
+    # Keyset pagination of the list endpoints
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_role_org_id_id ON role (org_id, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_permission_org_id_id"
+    " ON permission (org_id, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_project_org_id_id"
+    " ON project (org_id, id)",
+    # Role lookups by name, and permission filters by service / resource
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_role_org_id_name"
+    " ON role (org_id, name)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_permission_org_id_service_resource"
+    " ON permission (org_id, service, resource)",
+    # Users of an org, and the reverse sides of the join tables, used when
+    # invalidating the scopes of everyone holding a role or permission
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_org_id ON "user" (org_id)',
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_userrole_role_id ON userrole (role_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_rolepermission_permission_id"
+    " ON rolepermission (permission_id)",
+]
@@ -0,0 +1,6 @@
+"""Serve prefix LIKE on permission slugs within an org, under any collation."""
+
+indexes = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_permission_org_id_slug_pattern"
+    " ON permission (org_id, slug text_pattern_ops)",
+]
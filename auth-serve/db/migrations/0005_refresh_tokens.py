@@ -0,0 +1,21 @@
+"""Hashed, single-use refresh tokens (see db.tables.RefreshToken)."""
+
+statements = [
+    """
+    CREATE TABLE refreshtoken (
+        id UUID NOT NULL,
+        token_hash VARCHAR(64) NOT NULL,
+        family_id UUID NOT NULL,
+        user_id UUID NOT NULL,
+        scopes VARCHAR[] NOT NULL,
+        expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        used_at TIMESTAMP WITH TIME ZONE,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES "user" (id) ON DELETE CASCADE
+    )
+    """,
+    # Redeeming a token is one lookup by hash
+    "CREATE UNIQUE INDEX uq_refreshtoken_token_hash ON refreshtoken (token_hash)",
+    "CREATE INDEX ix_refreshtoken_family_id ON refreshtoken (family_id)",
+    "CREATE INDEX ix_refreshtoken_user_id ON refreshtoken (user_id)",
+]
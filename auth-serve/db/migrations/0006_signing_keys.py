@@ -0,0 +1,30 @@
+"""Signing keys shared by every node, for KEY_BACKEND=postgres.
+
+See db.tables.SigningKey and SigningKeyState.
+"""
+
+statements = [
+    """
+    CREATE TABLE signingkey (
+        kid VARCHAR(64) NOT NULL,
+        algorithm VARCHAR(16) NOT NULL,
+        private_pem BYTEA NOT NULL,
+        public_pem BYTEA NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        activated_at TIMESTAMP WITH TIME ZONE,
+        retired_at TIMESTAMP WITH TIME ZONE,
+        PRIMARY KEY (kid)
+    )
+    """,
+    """
+    CREATE TABLE signingkeystate (
+        id INTEGER NOT NULL,
+        current_kid VARCHAR(64),
+        version BIGINT NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(current_kid) REFERENCES signingkey (kid),
+        CONSTRAINT ck_signingkeystate_single_row CHECK (id = 1)
+    )
+    """,
+    "INSERT INTO signingkeystate (id, current_kid, version) VALUES (1, NULL, 0)",
+]
@@ -0,0 +1,18 @@
+"""Revoked tokens and users, shared by every worker (see db.tables.Revocation)."""
+
+statements = [
+    """
+    CREATE TABLE revocation (
+        id UUID NOT NULL,
+        jti VARCHAR(64),
+        user_id UUID NOT NULL,
+        revoked_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES "user" (id) ON DELETE CASCADE
+    )
+    """,
+    # Workers poll for recent rows, and drop expired ones
+    "CREATE INDEX ix_revocation_revoked_at ON revocation (revoked_at)",
+    "CREATE INDEX ix_revocation_expires_at ON revocation (expires_at)",
+]
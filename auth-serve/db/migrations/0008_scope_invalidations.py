@@ -0,0 +1,5 @@
+"""Revocation rows that only drop cached scopes (see db.tables.Revocation)."""
+
+statements = [
+    "ALTER TABLE revocation ADD COLUMN scopes_only BOOLEAN NOT NULL DEFAULT false",
+]
@@ -0,0 +1,7 @@
+"""Schema migrations, applied in version order by `python -m db.migrate`.
+
+Each module is named `<version>_<name>.py` and defines either `statements`,
+run together in one transaction, or `indexes`, `CREATE INDEX CONCURRENTLY`
+statements run one at a time outside a transaction so tables stay writable
+while they build. Applied migrations are never edited; add a new one.
+"""
@@ -0,0 +1,41 @@
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from utils.stats import LatencyWindow
+
+
+class InstrumentedSyncQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a slot."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.waits = LatencyWindow()
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.waits.record(time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            # Negative while the pool has not opened pool_size connections yet
+            "overflow": self.overflow(),
+            "max_overflow": self._max_overflow,
+            "timeouts": self.timeouts,
+            **self.waits.summary("wait_ms"),
+        }
+
+
+class InstrumentedQueuePool(InstrumentedSyncQueuePool, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long checkouts wait for a slot."""
@@ -2,14 +2,22 @@ import datetime
 import uuid
 from typing import List, Optional
 
+from sqlalchemy import BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlmodel import (
+    Boolean,
+    CheckConstraint,
     Column,
     DateTime,
     Field,
     ForeignKey,
+    Index,
+    LargeBinary,
     Relationship,
     SQLModel,
+    String,
     UniqueConstraint,
+    text,
 )
 
 from models import (
@@ -29,6 +37,7 @@ class Organization(OrganizationBase, table=True):
 class Project(ProjectBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     org_id: uuid.UUID = Field(foreign_key="organization.id")
+    __table_args__ = (Index("ix_project_org_id_id", "org_id", "id"),)
     created_at: datetime.datetime = Field(
         default_factory=datetime.datetime.utcnow,
         sa_column=Column(DateTime(timezone=True), default=datetime.datetime.utcnow),
@@ -37,7 +46,7 @@ class Project(ProjectBase, table=True):
 
 class User(UserBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    org_id: uuid.UUID = Field(foreign_key="organization.id")
+    org_id: uuid.UUID = Field(foreign_key="organization.id", index=True)
     is_active: bool = Field(default=True)
 
     user_roles: List["UserRole"] = Relationship(
@@ -51,9 +60,18 @@ class User(UserBase, table=True):
 
 class Role(RoleBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    org_id: uuid.UUID = Field(foreign_key="organization.id")
+    # NULL for the global system catalog shared by every org
+    org_id: Optional[uuid.UUID] = Field(default=None, foreign_key="organization.id")
     __table_args__ = (
         UniqueConstraint("name", "type", "org_id", name="uq_role_name_type_org"),
+        Index("ix_role_org_id_id", "org_id", "id"),
+        Index("ix_role_org_id_name", "org_id", "name"),
+        Index(
+            "uq_role_name_global",
+            "name",
+            unique=True,
+            postgresql_where=text("org_id IS NULL"),
+        ),
     )
 
     # backref to join tables
@@ -75,9 +93,24 @@ class Role(RoleBase, table=True):
 
 class Permission(PermissionBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    org_id: uuid.UUID = Field(foreign_key="organization.id")
+    # NULL for the global system catalog shared by every org
+    org_id: Optional[uuid.UUID] = Field(default=None, foreign_key="organization.id")
     __table_args__ = (
         UniqueConstraint("slug", "org_id", name="uq_permission_slug_org"),
+        Index("ix_permission_org_id_id", "org_id", "id"),
+        Index(
+            "ix_permission_org_id_slug_pattern",
+            "org_id",
+            "slug",
+            postgresql_ops={"slug": "text_pattern_ops"},
+        ),
+        Index("ix_permission_org_id_service_resource", "org_id", "service", "resource"),
+        Index(
+            "uq_permission_slug_global",
+            "slug",
+            unique=True,
+            postgresql_where=text("org_id IS NULL"),
+        ),
     )
 
     role_permissions: List["RolePermission"] = Relationship(
@@ -99,7 +132,9 @@ class UserRole(SQLModel, table=True):
         sa_column=Column(ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
     )
     role_id: int = Field(
-        sa_column=Column(ForeignKey("role.id", ondelete="CASCADE"), primary_key=True)
+        sa_column=Column(
+            ForeignKey("role.id", ondelete="CASCADE"), primary_key=True, index=True
+        )
     )
 
     user: "User" = Relationship(
@@ -118,7 +153,9 @@ class RolePermission(SQLModel, table=True):
     )
     permission_id: int = Field(
         sa_column=Column(
-            ForeignKey("permission.id", ondelete="CASCADE"), primary_key=True
+            ForeignKey("permission.id", ondelete="CASCADE"),
+            primary_key=True,
+            index=True,
         )
     )
 
@@ -130,3 +167,95 @@ class RolePermission(SQLModel, table=True):
         back_populates="role_permissions",
         sa_relationship_kwargs={"passive_deletes": True},
     )
+
+
+class RefreshToken(SQLModel, table=True):
+    """One opaque refresh token, stored as its keyed hash.
+
+    Tokens are single use: redeeming one marks it used and issues the next in
+    the same family. A used token coming back means it leaked, and the whole
+    family is revoked.
+    """
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    # Hex HMAC-SHA256 of the token under REFRESH_TOKEN_SECRET
+    token_hash: str = Field(sa_column=Column(String(64), nullable=False))
+    family_id: uuid.UUID = Field(index=True)
+    user_id: uuid.UUID = Field(
+        sa_column=Column(
+            ForeignKey("user.id", ondelete="CASCADE"), nullable=False, index=True
+        )
+    )
+    # Scopes asked for at login, granted again (if still held) on refresh
+    scopes: List[str] = Field(
+        default_factory=list, sa_column=Column(ARRAY(String), nullable=False)
+    )
+    expires_at: datetime.datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+    used_at: Optional[datetime.datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True))
+    )
+    __table_args__ = (Index("uq_refreshtoken_token_hash", "token_hash", unique=True),)
+
+
+class Revocation(SQLModel, table=True):
+    """A revoked token, by jti, or with no jti every token of the user so far.
+
+    With scopes_only set no token is revoked; workers only drop the user's
+    cached scopes. Kept until the tokens it covers have expired (the scope
+    cache entries, for scopes_only); workers poll new rows into memory (see
+    auth.revocation.RevocationSync).
+    """
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    jti: Optional[str] = Field(default=None, sa_column=Column(String(64)))
+    user_id: uuid.UUID = Field(
+        sa_column=Column(ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    )
+    revoked_at: datetime.datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False, index=True)
+    )
+    expires_at: datetime.datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False, index=True)
+    )
+    scopes_only: bool = Field(
+        default=False,
+        sa_column=Column(Boolean, nullable=False, server_default=text("false")),
+    )
+
+
+class SigningKey(SQLModel, table=True):
+    """A token signing keypair, when keys are kept in Postgres.
+
+    See auth.key_backends.PostgresKeyBackend; timestamps mirror KeyMetadata.
+    """
+
+    kid: str = Field(sa_column=Column(String(64), primary_key=True))
+    algorithm: str = Field(sa_column=Column(String(16), nullable=False))
+    private_pem: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    public_pem: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    created_at: datetime.datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+    activated_at: Optional[datetime.datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True))
+    )
+    retired_at: Optional[datetime.datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True))
+    )
+
+
+class SigningKeyState(SQLModel, table=True):
+    """The single row naming the current signing key.
+
+    `version` goes up with every change to the keys, so nodes poll this one
+    row to learn about rotations instead of reloading keys.
+    """
+
+    id: int = Field(default=1, primary_key=True)
+    current_kid: Optional[str] = Field(
+        default=None, sa_column=Column(ForeignKey("signingkey.kid"))
+    )
+    version: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+    __table_args__ = (CheckConstraint("id = 1", name="ck_signingkeystate_single_row"),)
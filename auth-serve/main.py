@@ -1,14 +1,27 @@
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.routes import (
+    introspection_router,
     jwks_router,
+    metrics_router,
     permission_router,
     project_router,
     role_router,
     user_router,
 )
-from db.engine import create_db_and_tables, drop_db_and_tables
+from auth.keystore import refresh_key_caches, run_key_cache_refresh
+from auth.rbac import RBAC
+from auth.revocation import revocation_sync
+from auth.rotation import run_key_rotation
+from auth.scopes import compile_route_requirements
+from config.settings import settings
+from db.engine import async_engine, drop_db_and_tables
+from utils.hashing import HashingQueueFull
 
 app = FastAPI(title="Auth Serve", version="0.1.0")
 
@@ -22,8 +35,40 @@ app.add_middleware(
 
 
 @app.on_event("startup")
-def on_startup():
-    create_db_and_tables()
+async def on_startup():
+    if not settings.REFRESH_TOKEN_SECRET:
+        raise RuntimeError(
+            "REFRESH_TOKEN_SECRET is not set; run `make secret-init` or set it in "
+            "the environment"
+        )
+    # The schema is managed by `python -m db.migrate`, run before the server
+    async with AsyncSession(async_engine) as db:
+        await RBAC(db).seed_system_catalog()
+    compile_route_requirements(app)
+    # Revocations made before this worker started must apply from its first
+    # request on
+    await revocation_sync.sync()
+    # Requests only read keys from memory, so load them before the first one
+    await asyncio.to_thread(refresh_key_caches)
+    app.state.revocation_sync = asyncio.create_task(revocation_sync.run())
+    app.state.key_cache_refresh = asyncio.create_task(run_key_cache_refresh())
+    app.state.key_rotation = asyncio.create_task(run_key_rotation())
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    app.state.revocation_sync.cancel()
+    app.state.key_cache_refresh.cancel()
+    app.state.key_rotation.cancel()
+
+
+@app.exception_handler(HashingQueueFull)
+async def hashing_queue_full_handler(request: Request, exc: HashingQueueFull):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"},
+    )
 
 
 @app.delete("/tables")
@@ -37,3 +82,5 @@ app.include_router(project_router)
 app.include_router(role_router)
 app.include_router(permission_router)
 app.include_router(jwks_router)
+app.include_router(introspection_router)
+app.include_router(metrics_router)
@@ -1,14 +1,24 @@
-from .auth import JWKSToken, SignupRequest, SignupResponse, Token
+from .auth import (
+    IntrospectionBatchRequest,
+    IntrospectionBatchResponse,
+    IntrospectionResponse,
+    JWKSToken,
+    SignupRequest,
+    SignupResponse,
+    Token,
+)
 from .organization import OrganizationBase, ProjectBase
+from .pagination import Page
 from .rbac import (
     APIKeyBase,
     AssignRoleRequest,
     AttachPermimissionToRoleRequest,
     PermissionBase,
     PermissionCreateRequest,
+    PermissionDictionaryResponse,
     RoleBase,
 )
-from .users import NewUserInvite, UserBase
+from .users import CurrentUser, NewUserInvite, UserBase
 
 __all__ = [
     "OrganizationBase",
@@ -24,5 +34,11 @@ __all__ = [
     "NewUserInvite",
     "AttachPermimissionToRoleRequest",
     "PermissionCreateRequest",
+    "PermissionDictionaryResponse",
     "JWKSToken",
+    "IntrospectionResponse",
+    "IntrospectionBatchRequest",
+    "IntrospectionBatchResponse",
+    "CurrentUser",
+    "Page",
 ]
@@ -1,4 +1,5 @@
 import uuid
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 from sqlmodel import SQLModel
@@ -20,6 +21,39 @@ class SignupResponse(SQLModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+
+class IntrospectionResponse(BaseModel):
+    """RFC 7662 token info; only `active` is set for inactive tokens."""
+
+    active: bool
+    scope: Optional[str] = None
+    sub: Optional[str] = None
+    org: Optional[str] = None
+    exp: Optional[int] = None
+    iat: Optional[int] = None
+    token_type: Optional[str] = None
+    jti: Optional[str] = None
+
+
+class IntrospectionBatchRequest(BaseModel):
+    tokens: List[str]
+
+
+class IntrospectionBatchResponse(BaseModel):
+    # In the order of the request's tokens
+    results: List[IntrospectionResponse]
+
+
+class KeyMetadata(BaseModel):
+    """Lifecycle of a signing key, as unix timestamps."""
+
+    algorithm: str
+    created_at: float
+    # Unset while the key is published ahead of signing
+    activated_at: Optional[float] = None
+    retired_at: Optional[float] = None
 
 
 class JWKSToken(BaseModel):
@@ -27,5 +61,10 @@ class JWKSToken(BaseModel):
     use: str = Field("sig")
     alg: str = Field("RS256")
     kid: str
-    n: str
-    e: str
+    # RSA
+    n: Optional[str] = None
+    e: Optional[str] = None
+    # EC and OKP
+    crv: Optional[str] = None
+    x: Optional[str] = None
+    y: Optional[str] = None
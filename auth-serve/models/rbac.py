@@ -47,8 +47,23 @@ class APIKeyBase(SQLModel):
 
 class JWTPayload(BaseModel):
     sub: str
+    org: str
     exp: datetime.datetime
-    iat: datetime.datetime
+    # A unix timestamp to the microsecond, so a token issued right after a
+    # revocation (see auth/revocation.py) is told apart from one issued before
+    iat: float
+    # Names the token, so it can be revoked on its own
+    jti: Optional[str] = None
+    # Either the slug list, or a mask with its dictionary version
+    scopes: Optional[List[str]] = None
+    scope_mask: Optional[str] = None
+    scope_version: Optional[str] = None
+
+
+class PermissionDictionaryResponse(BaseModel):
+    org: str
+    version: str
+    # Bit i of a scope mask stands for scopes[i]
     scopes: List[str]
 
 
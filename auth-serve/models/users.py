@@ -1,3 +1,6 @@
+import uuid
+from typing import Optional
+
 from sqlmodel import Field, SQLModel
 
 
@@ -9,3 +12,13 @@ class UserBase(SQLModel):
 
 class NewUserInvite(UserBase):
     role: str
+
+
+class CurrentUser(SQLModel):
+    """The caller as described by a verified token, without a DB lookup."""
+
+    id: uuid.UUID
+    org_id: uuid.UUID
+    # The token's jti and exp, to revoke it
+    jti: Optional[str] = None
+    exp: Optional[int] = None
@@ -0,0 +1,47 @@
+"""Run from the auth-serve directory:
+
+uv run python -m unittest discover tests
+"""
+
+import asyncio
+import base64
+import json
+import unittest
+
+import jwt
+
+from auth.rbac import RBAC
+
+
+def _segment(value: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def _token(header: dict) -> str:
+    """A token with the given header; its signature is never checked."""
+    return f"{_segment(header)}.{_segment({'sub': 'x'})}.c2lnbmF0dXJl"
+
+
+class ValidateAccessTokenTest(unittest.TestCase):
+    def validate(self, token: str) -> dict:
+        return asyncio.run(RBAC(db=None).validate_access_token(token))
+
+    def test_kid_that_is_not_a_string_is_an_invalid_token(self):
+        for kid in [[], {}, ["a"], {"a": 1}, 1, True]:
+            with self.subTest(kid=kid):
+                with self.assertRaises(jwt.InvalidTokenError):
+                    self.validate(_token({"alg": "RS256", "kid": kid}))
+
+    def test_missing_or_empty_kid_is_an_invalid_token(self):
+        for header in [{"alg": "RS256"}, {"alg": "RS256", "kid": ""}]:
+            with self.subTest(header=header):
+                with self.assertRaises(jwt.InvalidTokenError):
+                    self.validate(_token(header))
+
+    def test_unknown_kid_is_an_invalid_token(self):
+        with self.assertRaises(jwt.InvalidTokenError):
+            self.validate(_token({"alg": "RS256", "kid": "no-such-kid"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
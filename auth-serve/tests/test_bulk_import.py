@@ -0,0 +1,69 @@
+"""Run from the auth-serve directory:
+
+uv run python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import json
+import unittest
+import uuid
+
+from utils import Hasher
+from utils.bulk_import import BulkImporter
+
+HASH = Hasher().get_password_hash("password")
+
+
+def _record(n: int, **fields) -> dict:
+    return {
+        "username": f"user{n}",
+        "primary_email": f"user{n}@example.com",
+        "role": "user",
+        **fields,
+    }
+
+
+class ValidateTest(unittest.TestCase):
+    def setUp(self):
+        self.importer = BulkImporter(uuid.uuid4(), workers=1)
+        self.importer.role_ids = {"user": 1}
+
+    def validate(self, records: list) -> tuple[list, list]:
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            valid = self.importer.validate(list(enumerate(records, start=1)))
+        errors = [json.loads(line) for line in stderr.getvalue().splitlines()]
+        return valid, errors
+
+    def test_well_formed_hash_is_kept(self):
+        valid, errors = self.validate([_record(1, password_hash=HASH)])
+        self.assertEqual(errors, [])
+        self.assertEqual(valid[0][2], HASH)
+
+    def test_malformed_or_unsupported_hashes_are_rejected(self):
+        records = [
+            _record(1, password_hash=HASH[:-5]),
+            _record(2, password_hash="plaintext"),
+            _record(3, password_hash="$1$salt$md5cryptchecksum"),
+            _record(4, password_hash=12345),
+        ]
+        valid, errors = self.validate(records)
+        self.assertEqual(valid, [])
+        self.assertEqual([e["line"] for e in errors], [1, 2, 3, 4])
+        for error in errors:
+            self.assertEqual(error["error"], "password_hash is not a supported hash")
+
+    def test_password_and_hash_together_are_rejected(self):
+        valid, errors = self.validate([_record(1, password="pw", password_hash=HASH)])
+        self.assertEqual(valid, [])
+        self.assertEqual(errors[0]["error"], "Give either password or password_hash")
+
+    def test_empty_csv_column_counts_as_missing(self):
+        valid, errors = self.validate([_record(1, password="pw", password_hash="")])
+        self.assertEqual(errors, [])
+        self.assertIsNone(valid[0][2])
+
+
+if __name__ == "__main__":
+    unittest.main()
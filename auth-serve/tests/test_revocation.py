@@ -0,0 +1,65 @@
+"""Run from the auth-serve directory:
+
+uv run python -m unittest discover tests
+"""
+
+import datetime
+import time
+import unittest
+import uuid
+
+import jwt
+
+from auth.revocation import RevocationEpochs
+from models.rbac import JWTPayload
+
+
+def _issue(user_id: uuid.UUID, now: datetime.datetime) -> dict:
+    """The claims of a token issued at `now`, as verification sees them."""
+    payload = JWTPayload(
+        sub=str(user_id),
+        org=str(uuid.uuid4()),
+        exp=now + datetime.timedelta(hours=2),
+        iat=now.timestamp(),
+        scopes=["auth.user.read"],
+    ).model_dump(exclude_none=True)
+    token = jwt.encode(payload, "secret", algorithm="HS256")
+    return jwt.decode(
+        token, "secret", algorithms=["HS256"], options={"verify_exp": False}
+    )
+
+
+class RevocationEpochsTest(unittest.TestCase):
+    def setUp(self):
+        self.epochs = RevocationEpochs(max_age=2 * 60 * 60)
+        self.user_id = uuid.uuid4()
+        # Mid-second, so tokens either side of the revocation share the second
+        self.revoked_at = datetime.datetime(
+            2025, 1, 1, 12, 0, 0, 500_000, tzinfo=datetime.timezone.utc
+        )
+        self.epochs.revoke([self.user_id], self.revoked_at.timestamp())
+
+    def test_token_issued_before_revocation_is_revoked(self):
+        claims = _issue(self.user_id, self.revoked_at.replace(microsecond=100_000))
+        self.assertTrue(self.epochs.is_revoked(claims))
+
+    def test_token_issued_in_same_second_after_revocation_is_not_revoked(self):
+        claims = _issue(self.user_id, self.revoked_at.replace(microsecond=900_000))
+        self.assertEqual(int(claims["iat"]), int(self.revoked_at.timestamp()))
+        self.assertFalse(self.epochs.is_revoked(claims))
+
+    def test_login_right_after_revocation(self):
+        epochs = RevocationEpochs(max_age=2 * 60 * 60)
+        before = _issue(self.user_id, datetime.datetime.now(datetime.timezone.utc))
+        epochs.revoke([self.user_id], time.time())
+        after = _issue(self.user_id, datetime.datetime.now(datetime.timezone.utc))
+        self.assertTrue(epochs.is_revoked(before))
+        self.assertFalse(epochs.is_revoked(after))
+
+    def test_other_users_are_not_revoked(self):
+        claims = _issue(uuid.uuid4(), self.revoked_at.replace(microsecond=100_000))
+        self.assertFalse(self.epochs.is_revoked(claims))
+
+
+if __name__ == "__main__":
+    unittest.main()
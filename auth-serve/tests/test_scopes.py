@@ -0,0 +1,45 @@
+"""Run from the auth-serve directory:
+
+uv run python -m unittest discover tests
+"""
+
+import unittest
+
+from auth.scopes import CATALOG, PermissionDictionary
+
+
+class DictionaryVersionTest(unittest.TestCase):
+    def setUp(self):
+        self.dictionary = CATALOG.extend(["crm.billing.read", "crm.billing.write"])
+        self.mask = self.dictionary.mask(["auth.user.read", "crm.billing.write"])
+
+    def test_creating_a_permission_keeps_old_masks_valid(self):
+        extended = self.dictionary.extend(["crm.invoice.read"])
+        self.assertNotEqual(extended.version, self.dictionary.version)
+        self.assertTrue(extended.covers(self.dictionary.version))
+        self.assertEqual(
+            extended.slugs_of(self.mask), ["auth.user.read", "crm.billing.write"]
+        )
+
+    def test_deleting_a_permission_invalidates_masks(self):
+        shrunk = CATALOG.extend(["crm.billing.write"])
+        self.assertFalse(shrunk.covers(self.dictionary.version))
+        replaced = CATALOG.extend(["crm.billing.write", "crm.billing.read"])
+        self.assertFalse(replaced.covers(self.dictionary.version))
+
+    def test_newer_versions_are_not_covered(self):
+        extended = self.dictionary.extend(["crm.invoice.read"])
+        self.assertFalse(self.dictionary.covers(extended.version))
+
+    def test_malformed_versions_are_not_covered(self):
+        for version in ["", "abc", "-1-x", f"{len(CATALOG.slugs)}-nothash"]:
+            with self.subTest(version=version):
+                self.assertFalse(self.dictionary.covers(version))
+
+    def test_every_org_covers_the_catalog(self):
+        self.assertTrue(self.dictionary.covers(CATALOG.version))
+        self.assertTrue(PermissionDictionary(CATALOG.slugs).covers(CATALOG.version))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+"""Needs the configured database, migrated; writes nothing that outlives a test.
+
+uv run python -m unittest discover tests
+"""
+
+import unittest
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+
+from api.routes.permission import slug_filter
+from db.engine import engine
+from db.tables import Organization, Permission
+
+SLUGS = [
+    ("crm", "billing", "read"),
+    ("crm", "billing", "write"),
+    ("billing", "invoice", "read"),
+    ("auth_x", "user", "read"),
+    # Dotted names make slugs of more than three segments
+    ("crm.v2", "billing", "read"),
+    ("crm", "billing.v2", "read"),
+]
+
+
+def _database_up() -> bool:
+    try:
+        with engine.connect():
+            return True
+    except OperationalError:
+        return False
+
+
+@unittest.skipUnless(_database_up(), "database not reachable")
+class SlugFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = engine.connect()
+        self.transaction = self.connection.begin()
+        self.db = Session(bind=self.connection)
+        org = Organization(name="slug-filter", domain="example.com")
+        self.db.add(org)
+        self.db.flush()
+        self.org_id = org.id
+        self.db.add_all(
+            Permission(
+                org_id=org.id,
+                service=service,
+                resource=resource,
+                action=action,
+                slug=f"{service}.{resource}.{action}",
+            )
+            for service, resource, action in SLUGS
+        )
+        self.db.flush()
+
+    def tearDown(self):
+        self.db.close()
+        self.transaction.rollback()
+        self.connection.close()
+
+    def match(self, pattern: str) -> set:
+        return set(
+            self.db.exec(
+                select(Permission.slug).where(
+                    Permission.org_id == self.org_id, *slug_filter(pattern)
+                )
+            ).all()
+        )
+
+    def test_trailing_wildcard_is_a_prefix_match(self):
+        every_crm = {
+            "crm.billing.read",
+            "crm.billing.write",
+            "crm.billing.v2.read",
+            "crm.v2.billing.read",
+        }
+        self.assertEqual(self.match("crm.*"), every_crm)
+        self.assertEqual(self.match("crm*"), every_crm)
+        self.assertEqual(self.match("auth*"), {"auth_x.user.read"})
+        self.assertEqual(
+            self.match("crm.billing.*"), every_crm - {"crm.v2.billing.read"}
+        )
+        self.assertEqual(self.match("*"), {".".join(slug) for slug in SLUGS})
+
+    def test_system_permissions_by_service_prefix(self):
+        with Session(engine) as db:
+            slugs = set(
+                db.exec(
+                    select(Permission.slug).where(
+                        Permission.org_id.is_(None), *slug_filter("auth.*")
+                    )
+                ).all()
+            )
+        self.assertIn("auth.user.read", slugs)
+        self.assertIn("auth.permission.all", slugs)
+        self.assertTrue(all(slug.startswith("auth.") for slug in slugs))
+
+    def test_whole_and_partial_segment_wildcards_agree(self):
+        # `*.billing.read` is served by the columns, the others by LIKE and regex
+        expected = {"crm.billing.read"}
+        for pattern in [
+            "*.billing.read",
+            "*.bill*.read",
+            "*.*ing.read",
+            "c*.billing.read",
+        ]:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(self.match(pattern), expected)
+
+    def test_interior_wildcard_stays_within_a_segment(self):
+        self.assertEqual(self.match("crm.*.read"), {"crm.billing.read"})
+        self.assertEqual(self.match("crm*.read"), set())
+        self.assertEqual(
+            self.match("*.billing.*"),
+            {
+                "crm.billing.read",
+                "crm.billing.write",
+                "crm.billing.v2.read",
+            },
+        )
+        self.assertEqual(self.match("auth_*.*.*"), {"auth_x.user.read"})
+
+    def test_more_than_three_segments(self):
+        self.assertEqual(self.match("crm.*.billing.*"), {"crm.v2.billing.read"})
+        self.assertEqual(self.match("*.*.v2.*"), {"crm.billing.v2.read"})
+        self.assertEqual(
+            self.match("*.*.*.read"),
+            {
+                "crm.v2.billing.read",
+                "crm.billing.v2.read",
+            },
+        )
+
+    def test_unknown_action_matches_nothing_either_way(self):
+        self.assertEqual(self.match("*.*.nope"), set())
+        self.assertEqual(self.match("*.*.no*"), set())
+        self.assertEqual(self.match("crm.billing.nope"), set())
+
+    def test_like_special_characters_are_literal(self):
+        self.assertEqual(self.match("auth%.*.*"), set())
+        self.assertEqual(self.match("auth_x.*.read"), {"auth_x.user.read"})
+        self.assertEqual(self.match("authx*.*.*"), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,49 @@
 from passlib.context import CryptContext
+from passlib.registry import get_crypt_handler
+
+from config.settings import settings
+
+
+def create_crypt_context(scheme: str, rounds: int | None = None) -> CryptContext:
+    # Keep bcrypt in the list so existing hashes still verify after switching
+    # schemes; deprecated="auto" flags them for a rehash on next login.
+    schemes = list(dict.fromkeys([scheme, "bcrypt"]))
+    options = {}
+    default_rounds = getattr(get_crypt_handler(scheme), "default_rounds", None)
+    if rounds or default_rounds:
+        # Pinning the cost makes hashes with any other cost need an update
+        options[f"{scheme}__rounds"] = rounds or default_rounds
+    return CryptContext(schemes=schemes, deprecated="auto", **options)
+
+
+# Shared by every Hasher; building a CryptContext is not free
+pwd_context = create_crypt_context(
+    settings.PASSWORD_HASH_SCHEME, settings.PASSWORD_HASH_ROUNDS
+)
 
 
 class Hasher:
     def __init__(self):
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.pwd_context = pwd_context
 
     def get_password_hash(self, password):
         return self.pwd_context.hash(password)
 
+    def is_password_hash(self, value: str) -> bool:
+        """Whether `value` is a well-formed hash that verify_password accepts."""
+        handler = self.pwd_context.identify(value, resolve=True)
+        if handler is None:
+            return False
+        try:
+            handler.from_string(value)
+        except ValueError:
+            return False
+        return True
+
     def verify_password(self, plain_password, hashed_password):
         return self.pwd_context.verify(plain_password, hashed_password)
+
+    def verify_and_update(self, plain_password, hashed_password):
+        """Returns (verified, new_hash); new_hash is set when the stored hash
+        uses an outdated scheme or cost and should be replaced."""
+        return self.pwd_context.verify_and_update(plain_password, hashed_password)
@@ -0,0 +1,209 @@
+"""Bulk import users into an organization from a JSONL or CSV file.
+
+    uv run python -m utils.bulk_import users.jsonl --org-id <org uuid>
+
+Each record needs username, primary_email, role and either password or an
+already computed password_hash, not both. A password_hash must be a hash
+of PASSWORD_HASH_SCHEME or bcrypt, as login verifies it. Passwords are
+hashed in parallel, roles are resolved once, and every batch is inserted
+with set-based statements in a single transaction. Rows that fail are
+reported on stderr as JSON lines and do not abort the import.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+
+from auth.rbac import org_scope
+from config.settings import settings
+from db.engine import engine
+from db.tables import Organization, Role, User, UserRole
+from models.rbac import SystemRole
+from models.users import NewUserInvite
+from utils import Hasher
+
+# Records are (line number, raw dict)
+Record = Tuple[int, Dict]
+
+
+def read_records(path: Path) -> Iterator[Record]:
+    with path.open(newline="") as f:
+        if path.suffix.lower() == ".csv":
+            # Line 1 is the header
+            yield from enumerate(csv.DictReader(f), start=2)
+            return
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, {"_error": f"Invalid JSON: {e}"}
+
+
+def batched(records: Iterator[Record], size: int) -> Iterator[List[Record]]:
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+class BulkImporter:
+    def __init__(self, org_id: uuid.UUID, workers: int) -> None:
+        self.org_id = org_id
+        self.hasher = Hasher()
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.role_ids: Dict[str, int] = {}
+        self.imported = 0
+        self.failed = 0
+
+    def load_roles(self, db: Session) -> None:
+        if not db.get(Organization, self.org_id):
+            raise SystemExit(f"Organization {self.org_id} not found")
+        roles = db.exec(select(Role).where(org_scope(Role, self.org_id, "name"))).all()
+        self.role_ids = {role.name: role.id for role in roles}
+
+    def report(self, line_no: int, record: Dict, error: str) -> None:
+        self.failed += 1
+        row = {"line": line_no, "username": record.get("username"), "error": error}
+        print(json.dumps(row), file=sys.stderr)
+
+    def validate(self, batch: List[Record]) -> List[Tuple[int, NewUserInvite, str]]:
+        """Returns (line, user, password or hash) for rows that can be inserted."""
+        valid = []
+        seen = set()
+        for line_no, record in batch:
+            if "_error" in record:
+                self.report(line_no, record, record["_error"])
+                continue
+            # CSV gives empty strings for missing columns
+            password_hash = record.get("password_hash") or None
+            if password_hash is not None:
+                if record.get("password"):
+                    self.report(
+                        line_no, record, "Give either password or password_hash"
+                    )
+                    continue
+                if not (
+                    isinstance(password_hash, str)
+                    and self.hasher.is_password_hash(password_hash)
+                ):
+                    self.report(
+                        line_no, record, "password_hash is not a supported hash"
+                    )
+                    continue
+            try:
+                user = NewUserInvite.model_validate(
+                    {**record, "password": record.get("password") or password_hash}
+                )
+            except ValidationError as e:
+                fields = ", ".join(
+                    f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                    for err in e.errors()
+                )
+                self.report(line_no, record, f"Invalid record: {fields}")
+                continue
+            if user.role == SystemRole.owner.value:
+                self.report(line_no, record, "Cannot import owners")
+                continue
+            if user.role not in self.role_ids:
+                self.report(line_no, record, f"Role {user.role} not found")
+                continue
+            if user.username in seen or user.primary_email in seen:
+                self.report(line_no, record, "Duplicate user in batch")
+                continue
+            seen.update((user.username, user.primary_email))
+            valid.append((line_no, user, password_hash))
+        return valid
+
+    def import_batch(self, db: Session, batch: List[Record]) -> None:
+        valid = self.validate(batch)
+        if not valid:
+            return
+        # bcrypt releases the GIL, so threads hash in parallel
+        hashes = self.pool.map(
+            lambda row: row[2] or self.hasher.get_password_hash(row[1].password),
+            valid,
+        )
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "org_id": self.org_id,
+                "username": user.username,
+                "primary_email": user.primary_email,
+                "password": password_hash,
+                "is_active": True,
+            }
+            for (_, user, _), password_hash in zip(valid, hashes, strict=True)
+        ]
+        # Rows clashing with existing users are skipped, not fatal
+        inserted = db.exec(
+            insert(User).values(rows).on_conflict_do_nothing().returning(User.id)
+        ).all()
+        inserted_ids = {user_id for (user_id,) in inserted}
+
+        links = []
+        for (line_no, user, _), row in zip(valid, rows, strict=True):
+            if row["id"] not in inserted_ids:
+                self.report(line_no, user.model_dump(), "User already exists")
+                continue
+            links.append({"user_id": row["id"], "role_id": self.role_ids[user.role]})
+        if links:
+            db.exec(insert(UserRole).values(links))
+        db.commit()
+        self.imported += len(links)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", type=Path, help=".jsonl or .csv file")
+    parser.add_argument("--org-id", type=uuid.UUID, required=True)
+    # Postgres caps a statement at 65535 bind parameters, six per user row
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=5000,
+        choices=range(1, 10001),
+        metavar="1-10000",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.HASH_WORKERS or None,
+        help="Hashing threads (default: one per CPU)",
+    )
+    args = parser.parse_args()
+
+    importer = BulkImporter(args.org_id, workers=args.workers)
+    start = time.perf_counter()
+    with Session(engine) as db:
+        importer.load_roles(db)
+        for batch in batched(read_records(args.path), args.batch_size):
+            importer.import_batch(db, batch)
+            print(
+                f"imported {importer.imported}, failed {importer.failed}",
+                file=sys.stderr,
+            )
+    elapsed = time.perf_counter() - start
+    print(
+        json.dumps(
+            {
+                "imported": importer.imported,
+                "failed": importer.failed,
+                "seconds": round(elapsed, 2),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
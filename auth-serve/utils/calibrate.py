@@ -0,0 +1,69 @@
+"""Pick the password hash cost that hits a target verify latency on this machine.
+
+    uv run python -m utils.calibrate --target-ms 250
+
+Prints the measured latency per cost and the PASSWORD_HASH_ROUNDS to set.
+"""
+
+import argparse
+import time
+
+from passlib.registry import get_crypt_handler
+
+from config.settings import settings
+from utils import create_crypt_context
+
+PASSWORD = "calibration-password"
+
+
+def verify_ms(scheme: str, rounds: int, samples: int) -> float:
+    context = create_crypt_context(scheme, rounds)
+    hashed = context.hash(PASSWORD)
+    start = time.perf_counter()
+    for _ in range(samples):
+        context.verify(PASSWORD, hashed)
+    return (time.perf_counter() - start) / samples * 1000
+
+
+def calibrate(scheme: str, target_ms: float, samples: int) -> int:
+    handler = get_crypt_handler(scheme)
+    if getattr(handler, "rounds_cost", None) is None:
+        raise SystemExit(f"{scheme} has no tunable cost")
+
+    rounds = handler.min_rounds
+    if handler.rounds_cost == "linear":
+        # Cost grows linearly: measure once and scale
+        rounds = max(handler.default_rounds, rounds)
+        elapsed = verify_ms(scheme, rounds, samples)
+        print(f"rounds={rounds:<10} {elapsed:8.1f} ms")
+        return min(
+            max(int(rounds * target_ms / elapsed), handler.min_rounds),
+            handler.max_rounds,
+        )
+
+    # log2 cost: each step doubles the work, stop at the first one over target
+    best = rounds
+    while rounds <= handler.max_rounds:
+        elapsed = verify_ms(scheme, rounds, samples)
+        print(f"rounds={rounds:<10} {elapsed:8.1f} ms")
+        if elapsed > target_ms:
+            break
+        best = rounds
+        rounds += 1
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scheme", default=settings.PASSWORD_HASH_SCHEME)
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--samples", type=int, default=3)
+    args = parser.parse_args()
+
+    rounds = calibrate(args.scheme, args.target_ms, args.samples)
+    print(f"\nPASSWORD_HASH_SCHEME={args.scheme}")
+    print(f"PASSWORD_HASH_ROUNDS={rounds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from config.settings import settings
+from utils.stats import LatencyWindow
+
+T = TypeVar("T")
+
+
+class HashingQueueFull(Exception):
+    """Raised when every hashing worker is busy and the queue is full."""
+
+
+class HashingExecutor:
+    """Runs password hashing off the event loop on a bounded thread pool.
+
+    bcrypt releases the GIL, so threads hash in parallel while the event loop
+    keeps serving token checks. At most `workers + queue_size` calls are
+    in flight at once, counting hashes whose caller has gone away; beyond
+    that `run` raises HashingQueueFull right away instead of letting a login
+    burst queue up without bound.
+    """
+
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="hasher"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        # How long recent calls sat in the queue before a worker picked them up
+        self._waits = LatencyWindow()
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                self._rejected += 1
+                raise HashingQueueFull("Password hashing queue is full")
+            self._pending += 1
+        submitted_at = time.perf_counter()
+
+        def task():
+            with self._lock:
+                self._running += 1
+            self._waits.record(time.perf_counter() - submitted_at)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        try:
+            future = self._pool.submit(task)
+        except RuntimeError:
+            # Pool shut down
+            self._release()
+            raise
+        # Released when the hash is done, not when the caller stops waiting: a
+        # cancelled request (client gone) leaves a started hash running
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending, running = self._pending, self._running
+            completed, rejected = self._completed, self._rejected
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "running": running,
+            "queue_depth": pending - running,
+            "completed": completed,
+            "rejected": rejected,
+            **self._waits.summary("wait_ms"),
+        }
+
+
+hashing_executor = HashingExecutor(
+    workers=settings.HASH_WORKERS or os.cpu_count() or 1,
+    queue_size=settings.HASH_QUEUE_SIZE,
+)
@@ -0,0 +1,25 @@
+import threading
+from collections import deque
+
+
+class LatencyWindow:
+    """Percentiles over the most recent `size` recorded durations."""
+
+    def __init__(self, size: int = 1000) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def summary(self, prefix: str) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {f"{prefix}_p50": 0.0, f"{prefix}_p99": 0.0, f"{prefix}_max": 0.0}
+        return {
+            f"{prefix}_p50": samples[len(samples) // 2] * 1000,
+            f"{prefix}_p99": samples[int(len(samples) * 0.99)] * 1000,
+            f"{prefix}_max": samples[-1] * 1000,
+        }
@@ -0,0 +1,187 @@
+"""Verify auth-serve access tokens inside a resource service.
+
+Copy this package into a service, build one `JWKSVerifier` per process and
+share it. Keys come from auth-serve's JWKS, parsed once and cached by kid,
+so verifying a token needs no network in the steady state:
+
+- Keys are kept for the JWKS response's Cache-Control max-age. Once that
+  passes, a refresh starts in the background while the cached keys keep
+  serving. Refreshes send the last ETag, so an unchanged JWKS costs a 304.
+- A token with an unknown kid (a rotation) waits for one refetch. Concurrent
+  misses share that fetch, and misses within `min_refresh_interval` of the
+  last fetch don't fetch again, so junk kids can't hammer auth-serve.
+
+Plain Python:
+
+    verifier = JWKSVerifier("http://localhost:8000/.well-known/jwks.json")
+    claims = await verifier.verify(token)
+    scopes = await verifier.get_scopes(token, claims)
+
+FastAPI, see `security_dependency`.
+"""
+
+import asyncio
+import base64
+import re
+import time
+from typing import Annotated, Dict, Optional, Set, Tuple
+
+import httpx
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer, SecurityScopes
+
+MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class KeyFetchError(Exception):
+    """auth-serve could not be reached for keys or a permission dictionary."""
+
+
+class JWKSVerifier:
+    def __init__(
+        self,
+        jwks_url: str,
+        dictionary_url: Optional[str] = None,
+        default_max_age: float = 300,
+        min_refresh_interval: float = 30,
+        timeout: float = 5,
+    ) -> None:
+        self.jwks_url = jwks_url
+        # GET /permission/dictionary, to resolve compact scope_mask tokens
+        self.dictionary_url = dictionary_url
+        self.default_max_age = default_max_age
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._etag: Optional[str] = None
+        self._expires_at = 0.0
+        self._fetched_at = float("-inf")
+        self._fetch: Optional[asyncio.Task] = None
+        self._fetch_error: Optional[str] = None
+        # (org, scope_version) -> slugs
+        self._dictionaries: Dict[Tuple[str, str], list] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def verify(self, token: str) -> dict:
+        """The token's claims; raises jwt.InvalidTokenError if it isn't valid."""
+        kid = jwt.get_unverified_header(token).get("kid")
+        # Unverified, and a dict key below: anything but a string is no kid
+        if not kid or not isinstance(kid, str):
+            raise jwt.InvalidTokenError("Token has no kid")
+        key = await self.get_key(kid)
+        # The key type (RSA, EC or OKP) decides the algorithm, never the header
+        return jwt.decode(token, key.key, algorithms=[key.algorithm_name])
+
+    async def get_key(self, kid: str) -> jwt.PyJWK:
+        now = time.monotonic()
+        if now >= self._expires_at:
+            self._refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            if now - self._fetched_at >= self.min_refresh_interval:
+                self._refresh()
+            if self._fetch is not None:
+                await asyncio.shield(self._fetch)
+            key = self._keys.get(kid)
+        if key is None:
+            if not self._keys and self._fetch_error:
+                raise KeyFetchError(self._fetch_error)
+            raise jwt.InvalidTokenError("Token has no matching kid")
+        return key
+
+    def _refresh(self) -> None:
+        """Start a JWKS fetch unless one is already running."""
+        if self._fetch is None:
+            self._fetched_at = time.monotonic()
+            self._fetch = asyncio.create_task(self._fetch_keys())
+
+    async def _fetch_keys(self) -> None:
+        try:
+            headers = {"If-None-Match": self._etag} if self._etag else {}
+            response = await self.client.get(self.jwks_url, headers=headers)
+            if response.status_code != 304:
+                response.raise_for_status()
+                keys = {}
+                for jwk in response.json()["keys"]:
+                    try:
+                        keys[jwk["kid"]] = jwt.PyJWK(jwk)
+                    except jwt.PyJWKError:
+                        continue  # a key type this service can't use
+                self._keys = keys
+                self._etag = response.headers.get("etag")
+            self._fetch_error = None
+            match = MAX_AGE.search(response.headers.get("cache-control", ""))
+            max_age = int(match.group(1)) if match else self.default_max_age
+            self._expires_at = time.monotonic() + max(
+                max_age, self.min_refresh_interval
+            )
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            # Keep serving the keys we have; try again after the interval
+            self._fetch_error = f"Could not fetch {self.jwks_url}: {e}"
+            self._expires_at = time.monotonic() + self.min_refresh_interval
+        finally:
+            self._fetch = None
+
+    async def get_scopes(self, token: str, claims: dict) -> Set[str]:
+        """The token's scopes, from either the slug list or the compact mask."""
+        if "scopes" in claims:
+            return set(claims["scopes"])
+        if "scope_mask" not in claims or not self.dictionary_url:
+            raise jwt.InvalidTokenError("Token has no scopes")
+        # Bit i of scope_mask stands for slug i of the org's dictionary
+        version = claims.get("scope_version")
+        key = (claims["org"], version)
+        slugs = self._dictionaries.get(key)
+        if slugs is None:
+            try:
+                response = await self.client.get(
+                    self.dictionary_url,
+                    params={"version": version},
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+            except httpx.HTTPError as e:
+                raise KeyFetchError(f"Could not fetch {self.dictionary_url}") from e
+            if response.status_code != 200:
+                raise jwt.InvalidTokenError("Token scopes are out of date")
+            slugs = self._dictionaries[key] = response.json()["scopes"]
+        value = claims["scope_mask"]
+        mask = int.from_bytes(
+            base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)), "big"
+        )
+        return {slug for i, slug in enumerate(slugs) if mask >> i & 1}
+
+
+def security_dependency(verifier: JWKSVerifier, scheme: OAuth2PasswordBearer):
+    """A dependency for `Security(..., scopes=[...])` returning the claims.
+
+    Any one of the listed scopes grants access. Invalid tokens get 401,
+    missing scopes 403, and 503 if auth-serve can't be reached for keys.
+    """
+
+    async def has_access(
+        token: Annotated[str, Depends(scheme)], security_scopes: SecurityScopes
+    ) -> dict:
+        try:
+            claims = await verifier.verify(token)
+            scopes = await verifier.get_scopes(token, claims)
+        except jwt.InvalidTokenError as e:
+            raise HTTPException(status_code=401, detail=str(e)) from e
+        except KeyFetchError as e:
+            raise HTTPException(status_code=503, detail=str(e)) from e
+        if security_scopes.scopes and not scopes & set(security_scopes.scopes):
+            raise HTTPException(status_code=403, detail="Not enough permissions")
+        return claims
+
+    return has_access
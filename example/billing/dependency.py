@@ -1,11 +1,6 @@
-import httpx
-import json
-from typing import Annotated
+from fastapi.security import OAuth2PasswordBearer
 
-import jwt
-from jwt.algorithms import RSAAlgorithm
-from fastapi import Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer, SecurityScopes
+from auth_verifier import JWKSVerifier, security_dependency
 
 # Define scopes for your service
 SCOPES = {
@@ -18,47 +13,14 @@ SCOPES = {
 AUTH_URL = "http://localhost:8000/user/login"
 JWKS_URL = "http://localhost:8000/.well-known/jwks.json"
 USER_ME_URL = "http://localhost:8000/user/me"
+DICTIONARY_URL = "http://localhost:8000/permission/dictionary"
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl=AUTH_URL,
     scopes=SCOPES
 )
 
-async def validate_access_token(token:str):
-    unverified_header = jwt.get_unverified_header(token)
-    # Fetch the public key
-    async with httpx.AsyncClient() as client:
-        public_key = await client.get(JWKS_URL)
-        public_key = public_key.json()
-    kid = unverified_header.get("kid")
-    if not kid:
-        raise jwt.InvalidTokenError("Token has no kid")
-    matches = [k for k in public_key["keys"] if k["kid"] == kid]
-    matching = matches[0] if matches else None
-    if not matches:
-        raise jwt.InvalidTokenError("Token has no matching kid")
-    public_key = RSAAlgorithm.from_jwk(json.dumps(matching))
-    # Verify the token
-    return jwt.decode(token, public_key, algorithms=["RS256"])
+# One per process: keys are fetched once and cached by kid
+verifier = JWKSVerifier(JWKS_URL, dictionary_url=DICTIONARY_URL)
 
-async def has_access(
-    token: Annotated[str, Depends(oauth2_scheme)],
-    security_scopes: SecurityScopes
-):
-    try:
-        validated_token = await validate_access_token(token)
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    token_scopes = set(validated_token.get("scopes"))
-    required_scopes = set(security_scopes.scopes)
-
-    has_access = token_scopes & required_scopes
-    if not has_access:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
-    
-    return True
-    
-    
-    
-    
\ No newline at end of file
+has_access = security_dependency(verifier, oauth2_scheme)
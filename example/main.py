@@ -1,8 +1,15 @@
 from typing import Union
 
 from fastapi import FastAPI
+from billing.dependency import verifier
 from billing.router import billing_router
 
 app = FastAPI()
 
-app.include_router(billing_router)
\ No newline at end of file
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await verifier.aclose()
+
+
+app.include_router(billing_router)